@@ -1,8 +1,16 @@
 import streamlit as st
 import fitz  # PyMuPDF
 import os
+import time
 from together import Together
 from dotenv import load_dotenv
+from prescore import prescore, shortlist
+from result_cache import ResultCache, result_key
+from resume_sections import COMPRESSION_VERSION, clean_resume, compress_resume, count_tokens
+from skills import TAXONOMY_VERSION, format_keyword_matches, keyword_table
+from screening import (
+    RateLimiter, expand_uploads, parse_match_score, parse_resumes, rank_results, results_to_csv, screen_resumes
+)
 
 # --- SETUP ---
 # Load environment variables from .env file
@@ -18,9 +26,151 @@ except Exception as e:
     st.error(f"Could not initialize the Together client. Make sure your API key is set in a .env file as TOGETHER_API_KEY. Error: {e}")
     client = None
 
+MODEL = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
+TEMPERATURE = 0.7
+MAX_TOKENS = 1024
+RESULT_CACHE_PATH = os.environ.get("ATS_CACHE_PATH", os.path.join(".cache", "ats_results.sqlite3"))
+RESULT_CACHE_TTL_HOURS = float(os.environ.get("ATS_CACHE_TTL_HOURS", 24 * 7))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("ATS_CACHE_MAX_ENTRIES", 5000))
+# Resume tokens sent with a match-scoring prompt, after section-aware compression.
+RESUME_TOKEN_BUDGET = int(os.environ.get("ATS_RESUME_TOKEN_BUDGET", 1500))
+
+
+# --- PROMPTS ---
+
+SYSTEM_PROMPT_PERFECTION = """
+You are an expert career coach and professional resume writer. 
+Your task is to review the provided resume text and deliver structured, constructive feedback.
+
+You must perform the following:
+
+1. **Clarity & Impact:** 
+- Assess whether the resume clearly communicates the candidate’s skills, achievements, and career trajectory.
+- Comment on the strength and action-orientation of bullet points and descriptions.
+
+2. **ATS Compatibility:** 
+- Evaluate formatting, keyword usage, and structure for ATS readability.
+- Identify missing or weak keywords relevant to modern job descriptions.
+
+3. **Strengths & Weaknesses Summary:** 
+- Highlight what the resume does well. 
+- Point out areas that weaken its effectiveness.
+
+4. **Specific, Actionable Suggestions:** 
+- Organize your feedback under clear sections: 
+    - *Formatting*
+    - *Content*
+    - *Keywords*
+    - *Achievements/Impact*
+    - *Experience & Consistency*
+- Provide concrete recommendations for each.
+
+5. **Final Evaluation:** 
+- Conclude with an overall "Perfection Score" (Excellent, Good, Needs Improvement, Poor). 
+- Add a brief, encouraging closing remark.
+
+Your response must be professional, structured, and highly actionable. 
+Do not be conversational; focus on objective, career-focused feedback.
+"""
+
+SYSTEM_PROMPT_ATS = """
+You are a highly sophisticated Applicant Tracking System (ATS). 
+Your function is to analyze a resume against a given job description.
+
+Your main goal is to calculate a percentage match score based on how well the resume's 
+skills, years of experience, and qualifications align with the job requirements.
+
+You must provide the following in your response:
+
+1. **Percentage Match Score:** A single percentage value (e.g., "85%"). 
+The score must consider both skills/keywords alignment and the relevance of total years of experience compared to the job description.
+
+2. **Detailed Analysis:** 
+- Explain the reasoning behind the score. 
+- Highlight skills, tools, and qualifications that match the job description. 
+- Point out gaps in required skills, tools, or qualifications. 
+- Explicitly compare the candidate’s years of experience with the years required in the job description (if specified).
+
+3. **Keywords Analysis:** 
+- The keyword matches between the job description and the resume have already been computed and are given 
+below the job description as MATCHED and MISSING skills. Treat them as authoritative; do not re-extract keywords 
+or repeat them as a table. 
+- In a few bullet points, note the strength of the most important matches where the resume shows it 
+(e.g., "Python – 5 years (requirement: 3 years)") and which missing skills matter most.
+
+The analysis must be structured, data-driven, and non-conversational.
+"""
+
+
+def build_ats_prompt(resume_text, job_description, keyword_rows):
+    """User prompt pairing one resume with the job description and the precomputed keyword matches."""
+    return f"""
+    **RESUME:**
+    {resume_text}
+
+    ---
+
+    **JOB DESCRIPTION:**
+    {job_description}
+
+    ---
+
+    **KEYWORD MATCHES:**
+    {format_keyword_matches(keyword_rows)}
+    """
+
+
+def build_perfection_prompt(resume_text):
+    """User prompt asking for feedback on one resume."""
+    return f"Please review the following resume and provide feedback:\n\n---\n\n{resume_text}"
+
 
 # --- HELPER FUNCTIONS ---
 
+@st.cache_resource
+def get_result_cache():
+    """The on-disk cache of finished analyses, shared by all sessions."""
+    return ResultCache(RESULT_CACHE_PATH, ttl_seconds=RESULT_CACHE_TTL_HOURS * 3600,
+                       max_entries=RESULT_CACHE_MAX_ENTRIES)
+
+
+def analysis_key(kind, resume, system_prompt, job_description=""):
+    """Cache key for an analysis: resume bytes or text, JD, prompts and model settings.
+
+    The user prompt is built from the resume by keyword matching and
+    compression, so their versions and the prompt templates are part of the
+    key too; a hit can then be served without extracting the resume text.
+    """
+    templates = build_ats_prompt("", "", []) + build_perfection_prompt("")
+    return result_key(kind, resume, job_description, system_prompt, templates, TAXONOMY_VERSION,
+                      COMPRESSION_VERSION, RESUME_TOKEN_BUDGET, MODEL, TEMPERATURE, MAX_TOKENS)
+
+
+def show_keyword_table(rows):
+    """The locally computed keyword-presence table."""
+    if not rows:
+        st.caption("No skills from the built-in taxonomy were found in the job description.")
+        return
+    found = sum(row["in_resume"] for row in rows)
+    st.caption(f"{found} of {len(rows)} job description skills found in the resume.")
+    st.dataframe([{"Skill": row["skill"], "Category": row["category"], "In resume": "✅" if row["in_resume"] else "❌",
+                   "Resume mentions": row["resume_mentions"], "JD mentions": row["jd_mentions"]} for row in rows],
+                 hide_index=True, use_container_width=True)
+
+
+def show_token_savings(original_tokens, sent_tokens, kept=None):
+    saved = original_tokens - sent_tokens
+    percent = 100 * saved / original_tokens if original_tokens else 0
+    sections = f" Sections sent: {', '.join(kept)}." if kept else ""
+    st.caption(f"✂️ Sent {sent_tokens} of {original_tokens} resume tokens, saving {saved} ({percent:.0f}%).{sections}")
+
+
+def show_cache_hit(created_at):
+    age_minutes = (time.time() - created_at) / 60
+    age = f"{age_minutes:.0f} min" if age_minutes < 120 else f"{age_minutes / 60:.0f} h"
+    st.info(f"⚡ Cached result from {age} ago; no AI call was made. Tick 'Force refresh' to re-run the analysis.")
+
+
 def extract_text_from_pdf(pdf_file):
     """
     Extracts text from an uploaded PDF file.
@@ -39,26 +189,29 @@ def extract_text_from_pdf(pdf_file):
             return None
     return None
 
-def get_llm_response(prompt, system_prompt):
+def get_llm_response(prompt, system_prompt, report_errors=True):
     """
     Sends a prompt to the Together AI model and gets a response.
+    With report_errors=False (e.g. from worker threads) errors are only returned, not shown.
     """
     if not client:
-        st.error("Together AI client is not initialized. Cannot process the request.")
+        if report_errors:
+            st.error("Together AI client is not initialized. Cannot process the request.")
         return "Error: Client not initialized."
     try:
         response = client.chat.completions.create(
-            model="meta-llama/Llama-3.3-70B-Instruct-Turbo",
+            model=MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.7,
-            max_tokens=1024
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS
         )
         return response.choices[0].message.content
     except Exception as e:
-        st.error(f"An error occurred while communicating with the AI model: {e}")
+        if report_errors:
+            st.error(f"An error occurred while communicating with the AI model: {e}")
         return f"Error: {e}"
 
 
@@ -68,8 +221,8 @@ st.set_page_config(page_title="ATS Resume Tracker", layout="wide")
 st.title("📄 ATS Resume Tracker & Analyzer")
 st.markdown("Optimize your resume for Applicant Tracking Systems (ATS) and improve its quality.")
 
-# Create two tabs
-tab1, tab2 = st.tabs(["📝 Resume Perfection", "🎯 ATS Match Score"])
+# Create the tabs
+tab1, tab2, tab3 = st.tabs(["📝 Resume Perfection", "🎯 ATS Match Score", "📚 Bulk Screening"])
 
 # --- TAB 1: RESUME PERFECTION ---
 with tab1:
@@ -78,52 +231,30 @@ with tab1:
 
     uploaded_resume_perfection = st.file_uploader("Upload your Resume (PDF)", type=["pdf"], key="perfection_uploader")
 
+    refresh_perfection = st.checkbox("Force refresh", key="perfection_refresh",
+                                     help="Ignore any cached analysis of this resume and call the AI again.")
+
     if st.button("Analyze Resume", key="analyze_button"):
         if uploaded_resume_perfection is not None:
-            with st.spinner("Extracting text from resume..."):
-                resume_text = extract_text_from_pdf(uploaded_resume_perfection)
-                print(resume_text)
-            if resume_text:
-                st.success("Resume text extracted successfully!")
-                with st.spinner("AI is analyzing your resume... This may take a moment."):
-                    system_prompt_perfection = """
-                    You are an expert career coach and professional resume writer. 
-                    Your task is to review the provided resume text and deliver structured, constructive feedback.
-
-                    You must perform the following:
-
-                    1. **Clarity & Impact:** 
-                    - Assess whether the resume clearly communicates the candidate’s skills, achievements, and career trajectory.
-                    - Comment on the strength and action-orientation of bullet points and descriptions.
-
-                    2. **ATS Compatibility:** 
-                    - Evaluate formatting, keyword usage, and structure for ATS readability.
-                    - Identify missing or weak keywords relevant to modern job descriptions.
-
-                    3. **Strengths & Weaknesses Summary:** 
-                    - Highlight what the resume does well. 
-                    - Point out areas that weaken its effectiveness.
-
-                    4. **Specific, Actionable Suggestions:** 
-                    - Organize your feedback under clear sections: 
-                        - *Formatting*
-                        - *Content*
-                        - *Keywords*
-                        - *Achievements/Impact*
-                        - *Experience & Consistency*
-                    - Provide concrete recommendations for each.
-
-                    5. **Final Evaluation:** 
-                    - Conclude with an overall "Perfection Score" (Excellent, Good, Needs Improvement, Poor). 
-                    - Add a brief, encouraging closing remark.
-
-                    Your response must be professional, structured, and highly actionable. 
-                    Do not be conversational; focus on objective, career-focused feedback.
-                    """
-
-                    user_prompt_perfection = f"Please review the following resume and provide feedback:\n\n---\n\n{resume_text}"
-
-                    response = get_llm_response(user_prompt_perfection, system_prompt_perfection)
+            key = analysis_key("perfection", uploaded_resume_perfection.getvalue(), SYSTEM_PROMPT_PERFECTION)
+            cached = None if refresh_perfection else get_result_cache().get(key)
+            if cached:
+                show_cache_hit(cached[1])
+                st.subheader("AI Feedback on Your Resume")
+                st.markdown(cached[0])
+            else:
+                with st.spinner("Extracting text from resume..."):
+                    resume_text = extract_text_from_pdf(uploaded_resume_perfection)
+                    print(resume_text)
+                if resume_text:
+                    st.success("Resume text extracted successfully!")
+                    # Feedback covers the whole resume, so only layout noise is removed here.
+                    cleaned_text = clean_resume(resume_text)
+                    show_token_savings(count_tokens(resume_text), count_tokens(cleaned_text))
+                    with st.spinner("AI is analyzing your resume... This may take a moment."):
+                        response = get_llm_response(build_perfection_prompt(cleaned_text), SYSTEM_PROMPT_PERFECTION)
+                    if not response.startswith("Error:"):
+                        get_result_cache().put(key, response, kind="perfection")
 
                     st.subheader("AI Feedback on Your Resume")
                     st.markdown(response)
@@ -137,56 +268,144 @@ with tab2:
 
     uploaded_resume_ats = st.file_uploader("Upload your Resume (PDF)", type=["pdf"], key="ats_uploader")
     job_description = st.text_area("Paste the Job Description Here", height=300, key="jd_input")
+    refresh_ats = st.checkbox("Force refresh", key="ats_refresh",
+                              help="Ignore any cached result for this resume and job description and call the AI again.")
 
     if st.button("Calculate Match Score", key="match_button"):
         if uploaded_resume_ats is not None and job_description:
-            with st.spinner("Processing..."):
-                resume_text = extract_text_from_pdf(uploaded_resume_ats)
-                print(resume_text)
-                if resume_text:
-                    system_prompt_ats = """
-                    You are a highly sophisticated Applicant Tracking System (ATS). 
-                    Your function is to analyze a resume against a given job description.
-
-                    Your main goal is to calculate a percentage match score based on how well the resume's 
-                    skills, years of experience, and qualifications align with the job requirements.
-
-                    You must provide the following in your response:
-
-                    1. **Percentage Match Score:** A single percentage value (e.g., "85%"). 
-                    The score must consider both skills/keywords alignment and the relevance of total years of experience compared to the job description.
-
-                    2. **Detailed Analysis:** 
-                    - Explain the reasoning behind the score. 
-                    - Highlight skills, tools, and qualifications that match the job description. 
-                    - Point out gaps in required skills, tools, or qualifications. 
-                    - Explicitly compare the candidate’s years of experience with the years required in the job description (if specified).
-
-                    3. **Keywords Analysis:** 
-                    - Extract crucial keywords from the job description. 
-                    - Indicate whether each keyword was found in the resume. 
-                    - Note the strength of match where applicable (e.g., "Python – 5 years (requirement: 3 years)").
-
-                    The analysis must be structured, data-driven, and non-conversational.
-                    """
-
-                    user_prompt_ats = f"""
-                    **RESUME:**
-                    {resume_text}
-
-                    ---
-
-                    **JOB DESCRIPTION:**
-                    {job_description}
-                    """
-
-                    response_ats = get_llm_response(user_prompt_ats, system_prompt_ats)
-
-                    st.subheader("ATS Analysis Result")
-                    st.markdown(response_ats)
+            key = analysis_key("ats", uploaded_resume_ats.getvalue(), SYSTEM_PROMPT_ATS, job_description)
+            cached = None if refresh_ats else get_result_cache().get(key)
+            if cached:
+                show_cache_hit(cached[1])
+                if cached[2] is not None:
+                    # Stored with the analysis, so a hit needs no PDF extraction.
+                    st.subheader("Keywords Analysis")
+                    show_keyword_table(cached[2]["keyword_rows"])
+                st.subheader("ATS Analysis Result")
+                st.markdown(cached[0])
+            else:
+                with st.spinner("Processing..."):
+                    resume_text = extract_text_from_pdf(uploaded_resume_ats)
+                    print(resume_text)
+                    if resume_text:
+                        # Keyword matching is done locally; the AI only gets the results.
+                        keyword_rows = keyword_table(resume_text, job_description)
+                        st.subheader("Keywords Analysis")
+                        show_keyword_table(keyword_rows)
+
+                        compressed = compress_resume(resume_text, job_description, RESUME_TOKEN_BUDGET)
+                        show_token_savings(compressed.original_tokens, compressed.tokens, compressed.kept)
+
+                        user_prompt_ats = build_ats_prompt(compressed.text, job_description, keyword_rows)
+
+                        response_ats = get_llm_response(user_prompt_ats, SYSTEM_PROMPT_ATS)
+                        if not response_ats.startswith("Error:"):
+                            get_result_cache().put(key, response_ats, kind="ats",
+                                                   details={"keyword_rows": keyword_rows})
+
+                        st.subheader("ATS Analysis Result")
+                        st.markdown(response_ats)
         else:
             st.warning("Please upload a resume and provide a job description.")
 
+# --- TAB 3: BULK SCREENING ---
+with tab3:
+    st.header("Screen Many Resumes Against One Job Description")
+    st.markdown("Upload many resume PDFs (or ZIP archives of PDFs) and paste the job description. Resumes are scored concurrently and ranked as results arrive.")
+
+    uploaded_bulk = st.file_uploader("Upload Resumes (PDF or ZIP)", type=["pdf", "zip"],
+                                     accept_multiple_files=True, key="bulk_uploader")
+    bulk_job_description = st.text_area("Paste the Job Description Here", height=200, key="bulk_jd_input")
+    required_skills_input = st.text_input("Required skills (comma-separated)", key="bulk_skills",
+                                          placeholder="Python, SQL, AWS, Docker")
+    col1, col2, col3 = st.columns(3)
+    top_k = col1.number_input("Send top K to AI", min_value=0, max_value=5000, value=50,
+                              help="Only the best pre-scored resumes get a detailed AI analysis. 0 sends all of them.")
+    max_concurrency = col2.number_input("Concurrent AI requests", min_value=1, max_value=64, value=8,
+                                        help="Upper bound on LLM calls in flight at once.")
+    requests_per_minute = col3.number_input("Max requests per minute", min_value=1, max_value=6000, value=60,
+                                            help="Client-side rate limit, to stay under your Together AI plan's limit.")
+    refresh_bulk = st.checkbox("Force refresh", key="bulk_refresh",
+                               help="Ignore cached analyses and call the AI for every shortlisted resume.")
+
+    if st.button("Screen Resumes", key="bulk_button"):
+        if uploaded_bulk and bulk_job_description:
+            resumes = expand_uploads(uploaded_bulk)
+            with st.spinner(f"Extracting text from {len(resumes)} resume(s)..."):
+                texts = parse_resumes(resumes)
+            rows = [{"resume": name, "score": None, "analysis": f"Error reading PDF: {text}", "status": "error",
+                     "seconds": None} for name, text in texts.items() if isinstance(text, Exception)]
+            texts = {name: text for name, text in texts.items() if isinstance(text, str) and text.strip()}
+
+            # Cheap local pre-scoring decides which resumes are worth an AI call.
+            pre_scores = prescore(bulk_job_description, texts, required_skills_input.split(","))
+            selected = set(shortlist(pre_scores, int(top_k)))
+            rows += [{"resume": name, **pre_scores[name], "score": None, "analysis": "", "status": "below cutoff",
+                      "seconds": None} for name in pre_scores if name not in selected]
+            texts = {name: text for name, text in texts.items() if name in selected}
+
+            result_cache = get_result_cache()
+            keys = {name: analysis_key("ats", text, SYSTEM_PROMPT_ATS, bulk_job_description)
+                    for name, text in texts.items()}
+            if not refresh_bulk:
+                for name in list(texts):
+                    cached = result_cache.get(keys[name])
+                    if cached:
+                        rows.append({"resume": name, **pre_scores[name], "score": parse_match_score(cached[0]),
+                                     "analysis": cached[0], "status": "cached", "seconds": 0.0})
+                        del texts[name]
+
+            cached_count = len(selected) - len(texts)
+            progress = st.progress(0.0, text=f"Scoring the top {len(texts)} resume(s)"
+                                             f" ({cached_count} answered from cache)...")
+            table = st.empty()
+            limiter = RateLimiter(requests_per_minute)
+
+            compressed = {name: compress_resume(text, bulk_job_description, RESUME_TOKEN_BUDGET)
+                          for name, text in texts.items()}
+
+            def score_resume(name, text):
+                keyword_rows = keyword_table(text, bulk_job_description)
+                prompt = build_ats_prompt(compressed[name].text, bulk_job_description, keyword_rows)
+                response = get_llm_response(prompt, SYSTEM_PROMPT_ATS, report_errors=False)
+                if not response.startswith("Error:"):
+                    result_cache.put(keys[name], response, kind="ats", details={"keyword_rows": keyword_rows})
+                return response
+
+            for done, row in enumerate(screen_resumes(texts, score_resume, int(max_concurrency), limiter), start=1):
+                rows.append({"resume": row["resume"], **pre_scores[row["resume"]],
+                             **{k: v for k, v in row.items() if k != "resume"},
+                             "tokens_sent": compressed[row["resume"]].tokens,
+                             "tokens_saved": compressed[row["resume"]].tokens_saved})
+                progress.progress(done / len(texts), text=f"Scored {done}/{len(texts)} resume(s)")
+                table.dataframe([{k: v for k, v in r.items() if k != "analysis"} for r in rank_results(rows)],
+                                hide_index=True, use_container_width=True)
+            st.session_state["bulk_results"] = rank_results(rows)
+            if compressed:
+                original = sum(c.original_tokens for c in compressed.values())
+                sent = sum(c.tokens for c in compressed.values())
+                show_token_savings(original, sent)
+        else:
+            st.warning("Please upload resumes and provide a job description.")
+
+    if st.session_state.get("bulk_results"):
+        results = st.session_state["bulk_results"]
+        st.subheader("Ranked Candidates")
+        st.dataframe([{k: v for k, v in r.items() if k != "analysis"} for r in results], hide_index=True,
+                     use_container_width=True,
+                     column_config={
+                         "score": st.column_config.ProgressColumn("AI match %", min_value=0, max_value=100,
+                                                                  format="%.0f%%"),
+                         "pre_score": st.column_config.NumberColumn("Pre-score", format="%.1f"),
+                         "skill_coverage": st.column_config.NumberColumn("Skill coverage", format="%.0f%%"),
+                     })
+        st.download_button("Download results (CSV)", results_to_csv(results), file_name="screening_results.csv",
+                           mime="text/csv")
+        analysed = [r["resume"] for r in results if r["analysis"]]
+        if analysed:
+            shown = st.selectbox("Show analysis for", analysed)
+            st.markdown(next(r["analysis"] for r in results if r["resume"] == shown))
+
 # --- SIDEBAR ---
 st.sidebar.title("About")
 st.sidebar.info(
@@ -207,6 +426,16 @@ st.sidebar.markdown(
     2.  Upload your resume.
     3.  Paste the target job description into the text box.
     4.  Click 'Calculate Match Score'.
+
+    **Bulk Screening:**
+    1.  Go to the 'Bulk Screening' tab.
+    2.  Upload resume PDFs or a ZIP of PDFs.
+    3.  Paste the job description, list the required skills, and choose how many top pre-scored resumes to send to the AI.
+    4.  Set the concurrency and rate limits.
+    5.  Click 'Screen Resumes', then sort or download the ranked table.
     """
 )
 st.sidebar.warning("Note: This is an AI-powered tool. Always double-check the feedback and use your best judgment.")
+cache_stats = get_result_cache().stats()
+st.sidebar.caption(f"Result cache: {cache_stats['entries']} stored analyses, {cache_stats['hits']} hits and "
+                   f"{cache_stats['misses']} misses since the app started.")
@@ -0,0 +1,143 @@
+"""
+Cheap, deterministic pre-scoring of resumes against a job description.
+
+Runs locally before any LLM call so only a shortlist is sent for detailed
+analysis. Three signals are combined into a 0-100 pre-score:
+
+* TF-IDF cosine similarity between the JD and every resume, computed as one
+  matrix-vector product over the JD's vocabulary (IDF comes from the resume
+  pool, resume norms from each resume's full term counts).
+* Coverage of the required skills.
+* Years of experience found in the resume compared with the JD's requirement.
+"""
+import datetime
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or our the to we will with you your this that "
+    "who what which their they them he she his her its was were been being not but if all any can may must "
+    "should would could also etc".split())
+_YEARS_RE = re.compile(r"(\d{1,2})(?:\.\d)?\s*\+?\s*(?:-\s*\d{1,2}\s*)?(?:years?|yrs?)\b", re.I)
+_RANGE_RE = re.compile(
+    r"\b((?:19|20)\d{2})\s*(?:-|–|—|to)\s*((?:19|20)\d{2}|present|current|now|today)\b", re.I)
+
+DEFAULT_WEIGHTS = {"similarity": 0.5, "coverage": 0.3, "experience": 0.2}
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def tfidf_similarity(job_description, resumes):
+    """Cosine similarity of each resume's TF-IDF vector to the JD's, as an array."""
+    if not resumes:
+        return np.zeros(0)
+    counts = [Counter(tokenize(text)) for text in resumes]
+    jd_counts = Counter(tokenize(job_description))
+    vocab = list(jd_counts)
+    if not vocab:
+        return np.zeros(len(resumes))
+
+    # Only JD terms contribute to the dot product, so the matrix is resumes x JD vocabulary.
+    n = len(resumes)
+    document_frequency = Counter(term for c in counts for term in c)
+    idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in document_frequency.items()}
+    default_idf = math.log(1 + n) + 1
+    jd_idf = np.array([idf.get(term, default_idf) for term in vocab])
+    matrix = np.array([[c.get(term, 0) for term in vocab] for c in counts], dtype=np.float64)
+    query = np.array([jd_counts[term] for term in vocab], dtype=np.float64) * jd_idf
+
+    resume_norms = np.array([math.sqrt(sum((tf * idf[term]) ** 2 for term, tf in c.items())) for c in counts])
+    dots = (matrix * jd_idf) @ query
+    norms = resume_norms * np.linalg.norm(query)
+    return np.divide(dots, norms, out=np.zeros(n), where=norms > 0)
+
+
+def skill_pattern(skill):
+    """Case-insensitive whole-word pattern for a skill, tolerant of symbols like C++ or .NET."""
+    return re.compile(r"(?<![A-Za-z0-9])" + re.escape(skill.strip()) + r"(?![A-Za-z0-9])", re.I)
+
+
+def skill_coverage(text, skills):
+    """(fraction of skills found, found skills, missing skills)."""
+    if not skills:
+        return 1.0, [], []
+    found = [skill for skill, pattern in skills if pattern.search(text)]
+    missing = [skill for skill, _ in skills if skill not in found]
+    return len(found) / len(skills), found, missing
+
+
+def required_years(job_description):
+    """The smallest "N years" figure in the JD, or None."""
+    years = [int(m.group(1)) for m in _YEARS_RE.finditer(job_description)]
+    return min(years) if years else None
+
+
+def experience_years(text, today=None):
+    """Years of experience claimed in a resume.
+
+    Takes the larger of any explicit "N years" statement and the total span
+    of employment date ranges (overlapping ranges are merged). Only ranges in
+    the experience section count, so degree dates do not; without one, every
+    section but education is searched.
+    """
+    from resume_sections import clean_resume, split_sections
+
+    this_year = (today or datetime.date.today()).year
+    stated = max((int(m.group(1)) for m in _YEARS_RE.finditer(text)), default=0)
+    sections = split_sections(clean_resume(text))
+    employment = [s for s in sections if s.name == "experience"] or [s for s in sections if s.name != "education"]
+    spans = []
+    for start, end in _RANGE_RE.findall("\n".join(s.text for s in employment)):
+        start = int(start)
+        end = this_year if not end[0].isdigit() else int(end)
+        if start <= end <= this_year:
+            spans.append((start, end))
+    total, current_end = 0, None
+    for start, end in sorted(spans):
+        if current_end is None or start > current_end:
+            total += end - start
+            current_end = end
+        elif end > current_end:
+            total += end - current_end
+            current_end = end
+    return max(stated, total)
+
+
+def prescore(job_description, resumes, required_skills=(), weights=None):
+    """Scores {name: text} resumes; returns {name: details} with a 0-100 "pre_score".
+
+    Similarity is rescaled so the best resume in the pool scores 1, since raw
+    TF-IDF cosines are small and only their order matters.
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    names = list(resumes)
+    texts = [resumes[name] for name in names]
+    similarity = tfidf_similarity(job_description, texts)
+    best = similarity.max() if len(similarity) else 0
+    relative = similarity / best if best > 0 else similarity
+    skills = [(skill.strip(), skill_pattern(skill)) for skill in required_skills if skill.strip()]
+    needed_years = required_years(job_description)
+
+    scores = {}
+    for i, name in enumerate(names):
+        coverage, found, missing = skill_coverage(texts[i], skills)
+        years = experience_years(texts[i])
+        experience_fit = 1.0 if not needed_years else min(years / needed_years, 1.0)
+        pre_score = 100 * (weights["similarity"] * relative[i] + weights["coverage"] * coverage
+                           + weights["experience"] * experience_fit)
+        scores[name] = {"pre_score": round(float(pre_score), 1), "similarity": round(float(similarity[i]), 3),
+                        "skill_coverage": round(100 * coverage), "missing_skills": ", ".join(missing),
+                        "years": years}
+    return scores
+
+
+def shortlist(scores, top_k):
+    """Names of the `top_k` best pre-scored resumes (all of them if top_k is 0)."""
+    ranked = sorted(scores, key=lambda name: scores[name]["pre_score"], reverse=True)
+    return ranked[:top_k] if top_k else ranked
@@ -0,0 +1,100 @@
+"""
+Persistent cache of AI analyses, keyed by a content hash of their inputs.
+
+The key hashes everything that determines the answer: the resume (PDF bytes
+or extracted text), the job description, the system prompt, the user
+prompt's template and how the resume is reduced for it, the model and the
+sampling settings. Each entry can also hold JSON details computed from
+the resume alongside the analysis (such as the keyword table), so repeating
+an analysis with identical inputs skips both PDF extraction and the paid
+LLM call. Entries expire after
+`ttl_seconds`, and once more than `max_entries` are stored the least recently
+used ones are evicted. Everything lives in one small SQLite file.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def result_key(*parts):
+    """SHA-256 over the given str/bytes parts (length-prefixed, so parts cannot run together)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """A TTL- and size-bounded key -> (analysis, details) store."""
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    analysis TEXT NOT NULL,
+                    details TEXT,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS results_used ON results (used_at);
+            """)
+            # Caches written before details were stored get the column once here.
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+            if "details" not in columns:
+                self._conn.execute("ALTER TABLE results ADD COLUMN details TEXT")
+
+    def get(self, key):
+        """Returns (analysis, created_at, details) for a fresh entry, or None."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT analysis, created_at, details FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE results SET used_at = ? WHERE key = ?", (now, key))
+            return row[0], row[1], json.loads(row[2]) if row[2] is not None else None
+
+    def put(self, key, analysis, kind="ats", details=None):
+        """Stores an analysis (and optional JSON-serializable details), then evicts expired and LRU entries."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, kind, analysis, details, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, analysis, json.dumps(details) if details is not None else None, now, now))
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+            excess = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used_at LIMIT ?)", (excess,))
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {"entries": entries, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0}
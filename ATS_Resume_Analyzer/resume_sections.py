@@ -0,0 +1,225 @@
+"""
+Section-aware resume compression for the AI prompts.
+
+Raw PDF text carries layout whitespace, bullet glyphs on their own lines,
+page numbers and contact details repeated as page headers. `clean_resume`
+removes that furniture, and `split_sections` detects the usual resume
+sections (summary, experience, skills, education, projects, ...) from their
+headings. For match scoring, `compress_resume` then keeps only the sections
+that matter for the job description, most important first, within a token
+budget, and reports how many tokens that saved.
+"""
+import re
+from dataclasses import dataclass, field
+
+from prescore import tokenize
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SPACES_RE = re.compile(r"[ \t\u00a0\u2000-\u200b\u3000]+")
+_BULLET_RE = re.compile(r"^[•●▪◦■□►▸‣∙·*-]\s*")
+_PAGE_NUMBER_RE = re.compile(r"^(?:page\s*)?\d{1,3}(?:\s*(?:/|of)\s*\d{1,3})?$", re.I)
+_CONTACT_RE = re.compile(r"@|https?://|www\.|linkedin|github\.com|\+?\d[\d ().-]{7,}\d")
+
+SECTION_HEADINGS = {
+    "summary": ["summary", "professional summary", "career summary", "profile", "professional profile",
+                "objective", "career objective", "about me"],
+    "experience": ["experience", "work experience", "professional experience", "relevant experience",
+                   "employment", "employment history", "work history", "career history"],
+    "skills": ["skills", "technical skills", "key skills", "core skills", "core competencies", "competencies",
+               "technologies", "tech stack", "skills and tools", "areas of expertise"],
+    "education": ["education", "academic background", "education and training", "qualifications",
+                  "academic qualifications"],
+    "projects": ["projects", "personal projects", "key projects", "selected projects", "academic projects"],
+    "certifications": ["certifications", "certificates", "licenses and certifications",
+                       "certifications and training", "courses"],
+    "awards": ["awards", "honors", "honours", "achievements", "awards and honors"],
+    "publications": ["publications", "research"],
+    "volunteering": ["volunteer", "volunteering", "volunteer experience", "community involvement"],
+    "languages": ["languages"],
+    "interests": ["interests", "hobbies", "hobbies and interests"],
+    "references": ["references", "references available upon request"],
+}
+# Bump when cleaning or compression changes what is sent for a resume: cached analyses were written from the old text.
+COMPRESSION_VERSION = 1
+# Always worth sending for match scoring, in the order the budget is spent on them.
+CORE_SECTIONS = ("skills", "summary", "experience", "education")
+# Never relevant to a match score.
+DROPPED_SECTIONS = ("interests", "references")
+
+
+def count_tokens(text):
+    """Approximates the tokenizer: one token per word or punctuation mark."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def _heading_key(line):
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z ]", "", line.lower().replace("&", " and "))).strip()
+
+
+_HEADING_LOOKUP = {_heading_key(alias): name for name, aliases in SECTION_HEADINGS.items() for alias in aliases}
+
+
+def section_of(line):
+    """The section a heading line starts, or None if the line is not a heading."""
+    if len(line) > 40:
+        return None
+    return _HEADING_LOOKUP.get(_heading_key(line))
+
+
+def clean_resume(text):
+    """Normalizes whitespace and bullets and drops page numbers and repeated headers.
+
+    A line from the contact block at the top (before the first section
+    heading) that shows up again later is a page header and is dropped, as
+    are repeats of any line with an email, URL or phone number in it.
+    """
+    lines = []
+    pending_bullet = False
+    for raw in (text or "").splitlines():
+        line = _SPACES_RE.sub(" ", raw).strip()
+        if not line or _PAGE_NUMBER_RE.match(line):
+            continue
+        if _BULLET_RE.match(line):
+            line = _BULLET_RE.sub("", line)
+            if not line:
+                # PDF extraction often puts the bullet glyph on a line of its own.
+                pending_bullet = True
+                continue
+            line = "- " + line
+        elif pending_bullet:
+            line = "- " + line
+        pending_bullet = False
+        lines.append(line)
+
+    header = set()
+    for line in lines:
+        if section_of(line):
+            break
+        header.add(line)
+    seen = set()
+    out = []
+    in_header = True
+    for line in lines:
+        if in_header and section_of(line):
+            in_header = False
+        repeated = line in seen and (line in header or _CONTACT_RE.search(line))
+        if not in_header and line in header:
+            repeated = True
+        seen.add(line)
+        if not repeated:
+            out.append(line)
+    return "\n".join(out)
+
+
+@dataclass
+class Section:
+    name: str
+    heading: str
+    lines: list = field(default_factory=list)
+
+    @property
+    def text(self):
+        return "\n".join(([self.heading] if self.heading else []) + self.lines)
+
+
+def split_sections(text):
+    """Splits cleaned resume text into Sections; text before the first heading is the "header"."""
+    sections = [Section("header", "")]
+    for line in text.splitlines():
+        name = section_of(line)
+        if name:
+            sections.append(Section(name, line))
+        else:
+            sections[-1].lines.append(line)
+    return [s for s in sections if s.lines or s.name != "header"]
+
+
+@dataclass
+class CompressedResume:
+    text: str
+    original_tokens: int
+    tokens: int
+    kept: list
+    dropped: list
+
+    @property
+    def tokens_saved(self):
+        return self.original_tokens - self.tokens
+
+    @property
+    def saved_ratio(self):
+        return self.tokens_saved / self.original_tokens if self.original_tokens else 0.0
+
+
+def _truncate(section, budget):
+    """The section cut down, line by line, to fit `budget` tokens (None if nothing useful fits)."""
+    kept = Section(section.name, section.heading)
+    used = count_tokens(section.heading)
+    for line in section.lines:
+        cost = count_tokens(line)
+        if used + cost > budget:
+            break
+        kept.lines.append(line)
+        used += cost
+    return kept if kept.lines else None
+
+
+def compress_resume(text, job_description="", token_budget=1500):
+    """Cleans a resume and keeps the sections relevant to the JD within `token_budget` tokens.
+
+    Core sections (skills, summary, experience, education) are always
+    candidates; other sections are only kept if they share terms with the JD,
+    best overlap first. Without a JD every section except interests and
+    references is a candidate. Kept sections stay in resume order, and the
+    header is reduced to its first line (the candidate's name).
+    """
+    original_tokens = count_tokens(text or "")
+    sections = split_sections(clean_resume(text))
+    if len(sections) <= 1:
+        # No headings found: all we can do is send the cleaned text within budget.
+        single = sections[0] if sections else Section("header", "")
+        kept = _truncate(single, token_budget) if single.lines else None
+        if kept:
+            body = kept.text
+        else:
+            # One huge line: cut it at a word boundary instead.
+            words = single.text.split(" ")
+            while words and count_tokens(" ".join(words)) > token_budget:
+                words = words[:len(words) * 9 // 10]
+            body = " ".join(words)
+        return CompressedResume(body, original_tokens, count_tokens(body), ["all"] if body else [], [])
+
+    jd_terms = set(tokenize(job_description))
+    candidates = []
+    dropped = []
+    for index, section in enumerate(sections):
+        if section.name in DROPPED_SECTIONS:
+            dropped.append(section.name)
+        elif section.name == "header":
+            candidates.append((0, 0, index, Section("header", "", section.lines[:1])))
+        elif section.name in CORE_SECTIONS:
+            candidates.append((1, CORE_SECTIONS.index(section.name), index, section))
+        else:
+            overlap = len(jd_terms & set(tokenize(section.text)))
+            if jd_terms and not overlap:
+                dropped.append(section.name)
+            else:
+                candidates.append((2, -overlap, index, section))
+
+    chosen = []
+    remaining = token_budget
+    for _, _, index, section in sorted(candidates, key=lambda c: c[:3]):
+        cost = count_tokens(section.text)
+        if cost > remaining:
+            section = _truncate(section, remaining)
+            if section is None:
+                dropped.append(sections[index].name)
+                continue
+            cost = count_tokens(section.text)
+        chosen.append((index, section))
+        remaining -= cost
+
+    chosen.sort(key=lambda item: item[0])
+    body = "\n\n".join(section.text for _, section in chosen)
+    return CompressedResume(body, original_tokens, count_tokens(body),
+                            [section.name for _, section in chosen], dropped)
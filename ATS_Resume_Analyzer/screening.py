@@ -0,0 +1,161 @@
+"""
+Bulk resume screening helpers.
+
+Resumes (PDFs, or PDFs inside ZIP archives) are parsed in parallel in a
+process pool, then scored against one job description with a bounded number
+of concurrent LLM calls. A client-side token-bucket rate limiter keeps the
+request rate under the provider's limit, and results are yielded as soon as
+each call finishes, so the total time depends on the concurrency rather than
+on the number of resumes.
+"""
+import csv
+import io
+import multiprocessing
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import fitz  # PyMuPDF
+
+_SCORE_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+
+
+def _unique_name(name, seen):
+    """`name`, or `name (2)`, `name (3)`, ... if it was already used."""
+    unique, n = name, 1
+    while unique in seen:
+        n += 1
+        unique = f"{name} ({n})"
+    seen.add(unique)
+    return unique
+
+
+def expand_uploads(files):
+    """Turns uploaded PDFs and ZIP archives into (name, pdf_bytes) pairs.
+
+    Names are unique, since everything downstream is keyed by them: files
+    inside an archive are named `archive.zip/path/in/archive.pdf`, and a name
+    that is still taken (the same file uploaded twice) gets a " (2)" suffix.
+    """
+    resumes = []
+    seen = set()
+    for file in files:
+        data = file.getvalue()
+        if file.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    name = info.filename
+                    if info.is_dir() or not name.lower().endswith(".pdf") or name.startswith("__MACOSX/"):
+                        continue
+                    resumes.append((_unique_name(f"{file.name}/{name}", seen), archive.read(info)))
+        else:
+            resumes.append((_unique_name(file.name, seen), data))
+    return resumes
+
+
+def pdf_bytes_to_text(pdf_bytes):
+    """Extracts the text of a PDF given as bytes (runs in worker processes)."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return "".join(page.get_text() for page in doc)
+
+
+def parse_resumes(resumes, workers=None):
+    """Parses (name, pdf_bytes) pairs in parallel; returns {name: text or Exception}.
+
+    Names must be unique (see expand_uploads); a repeated name raises ValueError
+    rather than silently keeping only one of the resumes.
+    """
+    texts = {}
+    if not resumes:
+        return texts
+    names = [name for name, _ in resumes]
+    if len(set(names)) != len(names):
+        raise ValueError("Resume names must be unique")
+    # Spawned workers do not inherit the Streamlit server's threads and state.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(pdf_bytes_to_text, data): name for name, data in resumes}
+        for future in as_completed(futures):
+            try:
+                texts[futures[future]] = future.result()
+            except Exception as e:
+                texts[futures[future]] = e
+    return texts
+
+
+class RateLimiter:
+    """Token bucket allowing `rate_per_minute` requests, with bursts up to `burst`."""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(rate_per_minute // 6))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def parse_match_score(analysis):
+    """The first percentage in an ATS analysis, or None."""
+    match = _SCORE_RE.search(analysis or "")
+    if not match:
+        return None
+    return min(float(match.group(1)), 100.0)
+
+
+def screen_resumes(texts, score_fn, max_concurrency=8, limiter=None):
+    """Scores every resume text with `score_fn(name, text)`, yielding rows as they finish.
+
+    Each row is a dict with resume, score, analysis, status and seconds.
+    """
+    def run(name, text):
+        if limiter is not None:
+            limiter.acquire()
+        began = time.perf_counter()
+        analysis = score_fn(name, text)
+        elapsed = time.perf_counter() - began
+        failed = analysis is None or analysis.startswith("Error:")
+        return {"resume": name, "score": None if failed else parse_match_score(analysis),
+                "analysis": analysis or "", "status": "error" if failed else "done", "seconds": round(elapsed, 2)}
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = {pool.submit(run, name, text): name for name, text in texts.items()}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {"resume": futures[future], "score": None, "analysis": f"Error: {e}",
+                       "status": "error", "seconds": None}
+
+
+def rank_results(rows):
+    """Sorts rows by AI score, then pre-score, best first (unscored rows last), and numbers them."""
+    ranked = sorted(rows, key=lambda row: (row.get("score") is None, -(row.get("score") or 0),
+                                           -(row.get("pre_score") or 0), row["resume"]))
+    return [{"rank": i, **row} for i, row in enumerate(ranked, start=1)]
+
+
+def results_to_csv(rows):
+    """CSV text of ranked rows, including the full analyses."""
+    if not rows:
+        return ""
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
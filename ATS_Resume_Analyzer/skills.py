@@ -0,0 +1,287 @@
+"""
+Local skill taxonomy and keyword matching.
+
+Every skill has a canonical name, a category and a list of aliases. All
+aliases are compiled once into an Aho-Corasick automaton, so finding every
+skill mentioned in a resume or job description is a single linear pass over
+the text, however large the taxonomy. Matches only count on word boundaries,
+which keeps "Java" from matching inside "JavaScript" and "SQL" inside
+"PostgreSQL" while still allowing symbols such as "C++", "C#" or ".NET".
+Skills named by an ordinary English word ("swift", "react", "spark", ...)
+only match as a proper noun or in a qualified form ("react.js", "apache
+spark"), so "react quickly to a swift reply" mentions no skills. At the start
+of a sentence or line every word is capitalised, so there the bare name only
+counts as a list item ("Node, React"), not in prose like "Spark joy.".
+"""
+import functools
+from collections import deque
+
+# Bump when TAXONOMY or the matching rules change: cached analyses were written from the old matches.
+TAXONOMY_VERSION = 2
+
+# canonical name -> (category, aliases). Lower-case aliases match in any case; an alias
+# with capitals is an ordinary English word or abbreviation and only matches as written
+# or in all caps.
+TAXONOMY = {
+    # Programming languages
+    "Python": ("Language", ["python", "python3", "py3"]),
+    "Java": ("Language", ["java", "java 8", "java 11", "java 17", "core java"]),
+    "JavaScript": ("Language", ["javascript", "ecmascript", "es6", "js"]),
+    "TypeScript": ("Language", ["typescript"]),
+    "C": ("Language", ["c programming", "ansi c", "embedded c"]),
+    "C++": ("Language", ["c++", "cpp", "c plus plus"]),
+    "C#": ("Language", ["c#", "c sharp", "csharp"]),
+    "Go": ("Language", ["golang", "go lang", "go programming"]),
+    "Rust": ("Language", ["Rust", "rustlang"]),
+    "Ruby": ("Language", ["ruby"]),
+    "PHP": ("Language", ["php"]),
+    "Kotlin": ("Language", ["kotlin"]),
+    "Swift": ("Language", ["Swift", "swiftui", "swift programming"]),
+    "Scala": ("Language", ["scala"]),
+    "R": ("Language", ["r programming", "r language", "rstudio", "tidyverse"]),
+    "MATLAB": ("Language", ["matlab"]),
+    "SQL": ("Language", ["sql", "t-sql", "tsql", "pl/sql", "plsql"]),
+    "Bash": ("Language", ["bash", "shell scripting", "shell script", "zsh"]),
+    "HTML": ("Language", ["html", "html5"]),
+    "CSS": ("Language", ["css", "css3", "sass", "scss", "tailwind", "tailwindcss"]),
+    # Frameworks and libraries
+    "React": ("Framework", ["React", "react.js", "reactjs", "react native", "react hooks", "react redux"]),
+    "Angular": ("Framework", ["angular", "angularjs", "angular.js"]),
+    "Vue.js": ("Framework", ["vue", "vue.js", "vuejs", "nuxt"]),
+    "Node.js": ("Framework", ["Node", "node.js", "nodejs", "express.js", "expressjs"]),
+    "Next.js": ("Framework", ["next.js", "nextjs"]),
+    "Django": ("Framework", ["django", "django rest framework", "drf"]),
+    "Flask": ("Framework", ["flask"]),
+    "FastAPI": ("Framework", ["fastapi"]),
+    "Spring": ("Framework", ["spring boot", "springboot", "spring framework", "spring mvc"]),
+    ".NET": ("Framework", [".net", "dotnet", ".net core", "asp.net"]),
+    "Ruby on Rails": ("Framework", ["ruby on rails", "Rails", "ror"]),
+    "Pandas": ("Framework", ["pandas"]),
+    "NumPy": ("Framework", ["numpy"]),
+    "scikit-learn": ("Framework", ["scikit-learn", "sklearn", "scikit learn"]),
+    "TensorFlow": ("Framework", ["tensorflow", "tf2", "keras"]),
+    "PyTorch": ("Framework", ["pytorch", "Torch"]),
+    "Hugging Face": ("Framework", ["hugging face", "huggingface", "Transformers"]),
+    "LangChain": ("Framework", ["langchain", "llamaindex", "llama index"]),
+    "Apache Spark": ("Framework", ["Spark", "apache spark", "pyspark", "spark sql", "spark streaming"]),
+    "Hadoop": ("Framework", ["hadoop", "hdfs", "mapreduce", "Hive"]),
+    "Kafka": ("Framework", ["kafka", "apache kafka"]),
+    "Airflow": ("Framework", ["Airflow", "apache airflow"]),
+    "dbt": ("Framework", ["dbt", "data build tool"]),
+    "GraphQL": ("Framework", ["graphql"]),
+    "REST APIs": ("Framework", ["restful", "rest api", "rest apis", "restful apis"]),
+    # Databases
+    "PostgreSQL": ("Database", ["postgresql", "postgres", "psql"]),
+    "MySQL": ("Database", ["mysql", "mariadb"]),
+    "SQL Server": ("Database", ["sql server", "mssql", "ms sql"]),
+    "Oracle Database": ("Database", ["oracle database", "oracle db", "Oracle"]),
+    "MongoDB": ("Database", ["mongodb", "mongo"]),
+    "Redis": ("Database", ["redis"]),
+    "Elasticsearch": ("Database", ["elasticsearch", "elastic search", "opensearch", "elk"]),
+    "Cassandra": ("Database", ["cassandra"]),
+    "DynamoDB": ("Database", ["dynamodb", "dynamo db"]),
+    "Snowflake": ("Database", ["Snowflake"]),
+    "BigQuery": ("Database", ["bigquery", "big query"]),
+    "Redshift": ("Database", ["redshift"]),
+    # Cloud and DevOps
+    "AWS": ("Cloud", ["aws", "amazon web services", "ec2", "s3", "aws lambda", "cloudformation"]),
+    "Azure": ("Cloud", ["azure", "microsoft azure"]),
+    "Google Cloud": ("Cloud", ["gcp", "google cloud", "google cloud platform"]),
+    "Docker": ("DevOps", ["docker", "dockerfile", "docker compose", "containerization"]),
+    "Kubernetes": ("DevOps", ["kubernetes", "k8s", "Helm", "eks", "aks", "gke", "openshift"]),
+    "Terraform": ("DevOps", ["terraform", "infrastructure as code", "iac"]),
+    "Ansible": ("DevOps", ["ansible"]),
+    "CI/CD": ("DevOps", ["ci/cd", "ci cd", "continuous integration", "continuous delivery",
+                         "continuous deployment", "github actions", "gitlab ci", "circleci"]),
+    "Jenkins": ("DevOps", ["jenkins"]),
+    "Git": ("DevOps", ["git", "github", "gitlab", "bitbucket", "version control"]),
+    "Linux": ("DevOps", ["linux", "unix", "ubuntu", "rhel", "centos"]),
+    "Prometheus": ("DevOps", ["prometheus", "grafana"]),
+    # Data and AI practices
+    "Machine Learning": ("Practice", ["machine learning", "ML"]),
+    "Deep Learning": ("Practice", ["deep learning", "neural networks", "neural network"]),
+    "NLP": ("Practice", ["nlp", "natural language processing"]),
+    "Computer Vision": ("Practice", ["computer vision", "opencv", "image recognition"]),
+    "LLMs": ("Practice", ["llm", "llms", "large language models", "large language model", "generative ai",
+                          "genai", "prompt engineering", "rag", "retrieval augmented generation"]),
+    "Data Analysis": ("Practice", ["data analysis", "data analytics", "exploratory data analysis", "eda"]),
+    "Statistics": ("Practice", ["statistics", "statistical analysis", "hypothesis testing", "a/b testing"]),
+    "ETL": ("Practice", ["etl", "elt", "data pipelines", "data pipeline", "data engineering"]),
+    "Data Visualization": ("Practice", ["data visualization", "data visualisation", "matplotlib", "seaborn",
+                                        "plotly"]),
+    "Microservices": ("Practice", ["microservices", "microservice", "micro-services", "service oriented architecture"]),
+    "System Design": ("Practice", ["system design", "distributed systems"]),
+    "Unit Testing": ("Practice", ["unit testing", "unit tests", "pytest", "junit", "Jest", "tdd",
+                                  "test driven development"]),
+    "Agile": ("Practice", ["agile", "scrum", "kanban", "sprint planning"]),
+    "Security": ("Practice", ["cybersecurity", "cyber security", "information security", "owasp",
+                              "penetration testing", "siem"]),
+    # Business tools
+    "Excel": ("Tool", ["Excel", "ms excel", "microsoft excel", "vlookup", "pivot tables", "pivot table"]),
+    "Tableau": ("Tool", ["tableau"]),
+    "Power BI": ("Tool", ["power bi", "powerbi"]),
+    "Looker": ("Tool", ["looker", "looker studio"]),
+    "Jira": ("Tool", ["jira", "confluence"]),
+    "Salesforce": ("Tool", ["salesforce", "sfdc"]),
+    "SAP": ("Tool", ["SAP", "sap erp", "sap hana", "s/4hana"]),
+    "Figma": ("Tool", ["figma", "adobe xd"]),
+    # Certifications
+    "AWS Certified": ("Certification", ["aws certified", "aws solutions architect", "aws certified solutions architect",
+                                        "aws certified developer"]),
+    "Azure Certified": ("Certification", ["az-900", "az-104", "az-204", "azure certified",
+                                          "azure administrator associate"]),
+    "Google Cloud Certified": ("Certification", ["google cloud certified", "professional cloud architect"]),
+    "CKA": ("Certification", ["cka", "certified kubernetes administrator", "ckad"]),
+    "PMP": ("Certification", ["pmp", "project management professional"]),
+    "Scrum Master": ("Certification", ["csm", "certified scrummaster", "certified scrum master", "psm"]),
+    "CISSP": ("Certification", ["cissp"]),
+    "CompTIA Security+": ("Certification", ["security+", "comptia security+", "comptia security plus"]),
+    "CPA": ("Certification", ["cpa", "certified public accountant"]),
+    "CFA": ("Certification", ["cfa", "chartered financial analyst"]),
+    "Six Sigma": ("Certification", ["six sigma", "lean six sigma", "green belt", "black belt"]),
+    "ITIL": ("Certification", ["itil"]),
+}
+
+
+_BULLETS = frozenset(" \t-*•●▪◦■►")
+_ITEM_ENDS = frozenset(",;/|)\r\n")
+
+
+def _is_word_char(ch):
+    return ch.isalnum()
+
+
+def _at_sentence_start(text, start):
+    """True if only spaces or a bullet separate `start` from the text start, a line break or .!?"""
+    i = start - 1
+    while i >= 0 and text[i] in _BULLETS:
+        i -= 1
+    return i < 0 or text[i] in ".!?\n\r"
+
+
+def _ends_item(text, end):
+    """True if the word ending at `end` stands alone: a separator or the line end follows it."""
+    i = end
+    while i < len(text) and text[i] in " \t":
+        i += 1
+    return i == len(text) or text[i] in _ITEM_ENDS
+
+
+def _lower(text):
+    """`text` lower-cased character by character, so offsets still line up with `text`."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over lower-cased aliases, each mapped to a canonical skill.
+
+    Aliases containing capitals are case-sensitive: a match on one only counts
+    if the text has it exactly as written or in all caps, and a capitalised
+    word at the start of a sentence or line only counts as a list item.
+    """
+
+    def __init__(self, aliases):
+        # aliases: {alias: canonical}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for alias, canonical in aliases.items():
+            state = 0
+            for ch in alias.lower():
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            cased = alias if alias != alias.lower() else None
+            self._out[state].append((len(alias), canonical, cased))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Yields (start, end, canonical) for every whole-word alias occurrence in `text`."""
+        original, text = text, _lower(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, ch in enumerate(text, start=1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, canonical, cased in out[state]:
+                start = end - length
+                if cased:
+                    found = original[start:end]
+                    if found not in (cased, cased.upper()):
+                        continue
+                    # "Spark joy." is capitalised because it starts a sentence, "Spark, Hive" is a skills list.
+                    if (found != found.upper() and _at_sentence_start(original, start)
+                            and not _ends_item(original, end)):
+                        continue
+                # Require a word boundary on any side where the alias itself starts or ends with a word character.
+                if start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1]):
+                    continue
+                if end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+                    continue
+                yield start, end, canonical
+
+
+@functools.lru_cache(maxsize=1)
+def default_automaton():
+    """The automaton for TAXONOMY, built once per process."""
+    return KeywordAutomaton({alias: name for name, (_, aliases) in TAXONOMY.items() for alias in aliases})
+
+
+def find_skills(text, automaton=None):
+    """{canonical skill: number of mentions} found in `text`.
+
+    Overlapping matches resolve to the leftmost, longest alias, so "SQL Server"
+    counts once as SQL Server rather than also as SQL.
+    """
+    matches = sorted((automaton or default_automaton()).find(text or ""), key=lambda m: (m[0], m[0] - m[1]))
+    counts = {}
+    covered = 0
+    for start, end, canonical in matches:
+        if start < covered:
+            continue
+        covered = end
+        counts[canonical] = counts.get(canonical, 0) + 1
+    return counts
+
+
+def keyword_table(resume_text, job_description, automaton=None):
+    """One row per taxonomy skill the JD mentions, saying whether the resume mentions it too.
+
+    Rows are ordered by how often the JD mentions the skill, then by name.
+    """
+    jd_skills = find_skills(job_description, automaton)
+    resume_skills = find_skills(resume_text, automaton)
+    rows = [{"skill": name, "category": TAXONOMY[name][0] if name in TAXONOMY else "",
+             "in_resume": name in resume_skills, "resume_mentions": resume_skills.get(name, 0),
+             "jd_mentions": count}
+            for name, count in jd_skills.items()]
+    rows.sort(key=lambda row: (-row["jd_mentions"], row["skill"].lower()))
+    return rows
+
+
+def format_keyword_matches(rows):
+    """Compact text summary of a keyword table for the LLM prompt."""
+    if not rows:
+        return "No skills from the taxonomy were found in the job description."
+    matched = ", ".join(f"{row['skill']} ({row['resume_mentions']}x)" for row in rows if row["in_resume"])
+    missing = ", ".join(row["skill"] for row in rows if not row["in_resume"])
+    return f"MATCHED: {matched or 'none'}\nMISSING: {missing or 'none'}"
@@ -0,0 +1,30 @@
+import datetime
+
+from prescore import experience_years
+
+TODAY = datetime.date(2026, 6, 1)
+
+
+def test_education_dates_do_not_count_as_experience():
+    resume = """Jane Doe
+Education
+B.Sc. Computer Science, 2012 - 2016
+Experience
+Junior Developer, Acme 2023 - present
+"""
+    assert experience_years(resume, TODAY) == 3
+
+
+def test_overlapping_jobs_are_merged():
+    resume = """Work Experience
+Engineer, Foo 2015 - 2020
+Consultant, Bar 2018 - 2021
+Education
+M.Sc. 2013 - 2015
+"""
+    assert experience_years(resume, TODAY) == 6
+
+
+def test_ranges_count_without_headings_and_stated_years_win_when_larger():
+    assert experience_years("Developer at Acme 2020 - 2024", TODAY) == 4
+    assert experience_years("Summary\n10+ years building APIs\nExperience\nAcme 2020 - 2024", TODAY) == 10
@@ -0,0 +1,28 @@
+import sqlite3
+
+from result_cache import ResultCache
+
+
+def test_details_are_stored_with_the_analysis(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    rows = [{"skill": "Python", "category": "Languages", "in_resume": True, "resume_mentions": 3, "jd_mentions": 2}]
+    cache.put("ats-key", "85% match", details={"keyword_rows": rows})
+    cache.put("perfection-key", "Good", kind="perfection")
+
+    reopened = ResultCache(str(tmp_path / "results.sqlite3"))
+    analysis, _, details = reopened.get("ats-key")
+    assert analysis == "85% match"
+    assert details == {"keyword_rows": rows}
+    assert reopened.get("perfection-key")[2] is None
+
+
+def test_a_cache_written_before_details_gains_the_column(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE results (key TEXT PRIMARY KEY, kind TEXT NOT NULL, analysis TEXT NOT NULL, "
+                     "created_at REAL NOT NULL, used_at REAL NOT NULL)")
+    conn.close()
+
+    cache = ResultCache(path)
+    cache.put("key", "analysis", details={"keyword_rows": []})
+    assert cache.get("key")[2] == {"keyword_rows": []}
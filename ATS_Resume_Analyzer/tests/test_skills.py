@@ -0,0 +1,33 @@
+import pytest
+
+from skills import find_skills
+
+
+@pytest.mark.parametrize("text", [
+    "Node failures.",
+    "Swift delivery.",
+    "Spark joy.",
+    "Oracle of Delphi",
+    "Reduced outages. Node failures dropped by half!",
+    "- Swift delivery of every release",
+    "Mixed 250 ml of water with the sap of a maple.",
+    "react quickly to a swift reply",
+])
+def test_ordinary_words_are_not_skills(text):
+    assert find_skills(text) == {}
+
+
+@pytest.mark.parametrize("text, skill", [
+    ("Built services in Node.js.", "Node.js"),
+    ("Ran batch jobs on Apache Spark", "Apache Spark"),
+    ("Tuned queries in Oracle Database 19c", "Oracle Database"),
+    ("Swift programming for iOS", "Swift"),
+    ("Shipped iOS apps in Swift and Kotlin", "Swift"),
+    ("Skills\nNode, React, Spark", "Node.js"),
+    ("Skills\nSpark / Hive", "Apache Spark"),
+    ("- Oracle", "Oracle Database"),
+    ("ML pipelines on SAP HANA", "Machine Learning"),
+    ("Led the SAP rollout", "SAP"),
+])
+def test_skills_still_match(text, skill):
+    assert skill in find_skills(text)
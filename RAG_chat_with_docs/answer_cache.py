@@ -0,0 +1,100 @@
+"""
+Semantic cache of answers for repeated questions.
+
+Answers are keyed by the question's embedding: a new question whose cosine
+similarity to a cached one clears `threshold` gets the stored answer and its
+context back without querying the collection or calling the LLM. Each entry
+remembers the collection generation it was produced from, so any ingestion
+that changes the collection invalidates it. Entries are also bounded by LRU
+size and a TTL.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+GENERATION_FILE = "generation"
+
+
+def read_generation(persist_dir):
+    """Returns the collection's generation counter (0 if it was never bumped)."""
+    try:
+        with open(os.path.join(persist_dir, GENERATION_FILE), "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_generation(persist_dir):
+    """Marks the collection as changed; call after every write that alters it."""
+    os.makedirs(persist_dir, exist_ok=True)
+    generation = read_generation(persist_dir) + 1
+    tmp_path = os.path.join(persist_dir, GENERATION_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(generation))
+    os.replace(tmp_path, os.path.join(persist_dir, GENERATION_FILE))
+    return generation
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """An LRU + TTL bounded cache of (question embedding -> answer, context)."""
+
+    def __init__(self, threshold=0.92, max_entries=256, ttl_seconds=3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, generation, now):
+        stale = [key for key, entry in self._entries.items()
+                 if entry["generation"] != generation or now - entry["created"] > self.ttl_seconds]
+        for key in stale:
+            del self._entries[key]
+
+    def lookup(self, query_embedding, generation):
+        """Returns (answer, context) for a similar cached question, or None."""
+        with self._lock:
+            self._prune(generation, time.time())
+            if not self._entries:
+                self.misses += 1
+                return None
+            keys = list(self._entries)
+            matrix = np.stack([self._entries[key]["embedding"] for key in keys])
+            scores = matrix @ _normalize(query_embedding)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(keys[best])
+            entry = self._entries[keys[best]]
+            return entry["answer"], entry["context"]
+
+    def store(self, query_embedding, answer, context, generation):
+        """Caches an answer produced from the given collection generation."""
+        with self._lock:
+            self._entries[self._next_key] = {
+                "embedding": _normalize(query_embedding),
+                "answer": answer,
+                "context": context,
+                "generation": generation,
+                "created": time.time(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
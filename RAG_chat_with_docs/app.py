@@ -1,15 +1,30 @@
 import streamlit as st
 import os
-import tempfile
-import requests
-from pathlib import Path
-from pypdf import PdfReader
-from bs4 import BeautifulSoup
-from sentence_transformers import SentenceTransformer
+import time
+import datetime
 import chromadb
-import uuid
 from together import Together
 from dotenv import load_dotenv
+from ingest import Source, delete_source, run_pipeline, unique_name
+from embedding_cache import CachedEncoder, EmbeddingCache
+from embedding_service import BatchingEncoder
+from encoder_backends import load_encoder, resolve_model
+from answer_cache import SemanticAnswerCache, bump_generation, read_generation
+from bm25 import BM25Index
+from retrieval import hybrid_rank
+from context import assemble_context
+from vector_store import build_where, open_vector_store
+from locks import StoreLockedError, lock_directory
+from fetcher import UrlFetcher
+from jobs import JobManager
+from splitter import count_tokens
+from tracing import Tracer
+from config import (
+    BM25_INDEX_PATH, CHROMA_PERSIST_DIR, COLLECTION_NAME, EMBED_MAX_BATCH, EMBED_MAX_WAIT_MS, EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_KEY, EMBEDDING_MODEL_NAME, EMBEDDING_MODEL_PATH, EMBEDDING_THREADS,
+    HTTP_CACHE_DIR, JOBS_DB_PATH, NUMPY_INDEX_DIR, NUMPY_IVF_LISTS, NUMPY_QUANTIZATION, TRACE_PATH, TRACING_ENABLED,
+    VECTOR_BACKEND
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -28,6 +43,14 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# The app and the CLIs (index_cli.py, snapshot.py) never write the stores at the same time, whatever the backend.
+try:
+    lock_directory(CHROMA_PERSIST_DIR)
+except StoreLockedError as e:
+    # Nothing is cached yet, so a refresh retries once the other process has exited.
+    st.error(str(e))
+    st.stop()
+
 # --- Sidebar for Inputs ---
 with st.sidebar:
     st.header("⚙️ Configuration")
@@ -45,24 +68,52 @@ with st.sidebar:
     url_input = st.text_area("Enter URLs (one per line)", placeholder="https://example.com\nhttps://another-example.com")
     process_button = st.button("Process Documents & URLs")
 
+    st.header("🔍 Retrieval")
+    sparse_weight = st.slider(
+        "Keyword (BM25) weight", 0.0, 1.0, 0.5, 0.05,
+        help="Share of keyword search in the hybrid ranking. 0 is pure semantic search, 1 is pure keyword search."
+    )
+    sparse_prefilter = st.checkbox(
+        "Use keyword search as a pre-filter",
+        help="Only score the vectors of keyword matches. Faster on large collections, but misses purely semantic matches."
+    )
+    context_budget = st.slider(
+        "Context token budget", 300, 4000, 1500, 100,
+        help="Tokens of retrieved context sent with each question. Overlapping chunks are merged and near-duplicates dropped."
+    )
+    trace_turns = st.checkbox(
+        "Record stage timings", value=TRACING_ENABLED,
+        help=f"Show a per-answer timing breakdown and append the spans to {TRACE_PATH}."
+    )
+
     st.markdown("---")
     st.header("About")
     st.info("This RAG app, offering more transparent control over the document processing and retrieval pipeline.")
 
 # --- Core Logic ---
 
-# Define the persistent directory for ChromaDB
-CHROMA_PERSIST_DIR = "chroma_db_persistent"
-COLLECTION_NAME = "documents_collection"
-
 # Initialize the embedding model
 @st.cache_resource
 def get_embedding_model():
-    """Loads the sentence-transformer model."""
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    """Loads the sentence-transformer model with the configured CPU backend."""
+    return load_encoder(resolve_model(EMBEDDING_MODEL_NAME, EMBEDDING_MODEL_PATH), EMBEDDING_BACKEND, EMBEDDING_THREADS)
 
 embedding_model = get_embedding_model()
 
+@st.cache_resource
+def get_embedding_service():
+    """Micro-batches query embeddings from all sessions into shared model calls."""
+    return BatchingEncoder(embedding_model, max_wait_ms=EMBED_MAX_WAIT_MS, max_batch=EMBED_MAX_BATCH)
+
+embedding_service = get_embedding_service()
+
+@st.cache_resource
+def get_embedding_cache():
+    """Opens the on-disk embedding cache for the current model."""
+    return EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_KEY)
+
+embedding_cache = get_embedding_cache()
+
 # Initialize ChromaDB client and collection
 @st.cache_resource
 def get_chroma_collection():
@@ -71,68 +122,120 @@ def get_chroma_collection():
     collection = client.get_or_create_collection(name=COLLECTION_NAME)
     return collection
 
-collection = get_chroma_collection()
-
-def simple_text_splitter(text, chunk_size=1000, chunk_overlap=200):
-    """A simple text splitter function."""
-    if len(text) <= chunk_size:
-        return [text]
-    
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start += chunk_size - chunk_overlap
-    return chunks
+@st.cache_resource
+def get_vector_store():
+    """Opens the configured vector backend behind the common retrieval interface."""
+    return open_vector_store(
+        VECTOR_BACKEND,
+        collection_factory=get_chroma_collection,
+        path=NUMPY_INDEX_DIR,
+        ivf_lists=NUMPY_IVF_LISTS,
+        quantization=NUMPY_QUANTIZATION
+    )
+
+vector_store = get_vector_store()
+
+@st.cache_resource
+def get_bm25_index():
+    """Opens the BM25 index stored next to ChromaDB, backfilling it from the vector store if empty."""
+    os.makedirs(CHROMA_PERSIST_DIR, exist_ok=True)
+    index = BM25Index(BM25_INDEX_PATH)
+    if index.count() == 0 and vector_store.count() > 0:
+        index.backfill(vector_store)
+    return index
+
+bm25_index = get_bm25_index()
+
+@st.cache_resource
+def get_url_fetcher():
+    """Shares one pooled HTTP session and conditional GET cache across runs."""
+    return UrlFetcher(cache_dir=HTTP_CACHE_DIR)
+
+url_fetcher = get_url_fetcher()
+
+@st.cache_resource
+def get_answer_cache():
+    """Shares one semantic answer cache across all sessions."""
+    return SemanticAnswerCache()
+
+answer_cache = get_answer_cache()
+
+@st.cache_resource
+def get_tracer():
+    """Appends stage spans from every session to one JSONL trace file."""
+    return Tracer(TRACE_PATH, enabled=TRACING_ENABLED)
+
+tracer = get_tracer()
+
+def run_ingestion_job(sources, on_progress, on_source_done):
+    """Runs one background ingestion job through the staged pipeline."""
+    trace = tracer.start("ingest", sources=len(sources))
+    result = run_pipeline(sources, CachedEncoder(embedding_model, embedding_cache), vector_store,
+                          sparse_index=bm25_index, fetcher=url_fetcher,
+                          on_progress=on_progress, on_source_done=on_source_done, trace=trace)
+    embedding_cache.flush()
+    trace.finish(chunks=result.chunks, skipped=result.skipped, errors=len(result.errors))
+    return result
+
+def finish_ingestion_job(result):
+    """Invalidates cached answers once a job has changed the collection."""
+    if result.chunks or result.deleted:
+        bump_generation(CHROMA_PERSIST_DIR)
+
+@st.cache_resource
+def get_job_manager():
+    """Starts the background ingestion worker shared by all sessions."""
+    os.makedirs(CHROMA_PERSIST_DIR, exist_ok=True)
+    return JobManager(JOBS_DB_PATH, run_ingestion_job, on_finished=finish_ingestion_job)
+
+job_manager = get_job_manager()
 
 def process_data(files, urls):
-    """Loads, splits, and embeds documents and URLs."""
-    all_text = ""
-    sources = []
-    with st.spinner('Processing your sources... This may take a moment.'):
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Process PDFs
-            for file in files:
-                file_path = Path(temp_dir) / file.name
-                with open(file_path, "wb") as f:
-                    f.write(file.getbuffer())
-                
-                reader = PdfReader(str(file_path))
-                pdf_text = "".join(page.extract_text() for page in reader.pages if page.extract_text())
-                all_text += pdf_text + "\n"
-                sources.append(file.name)
-
-        # Process URLs
-        url_list = [url.strip() for url in urls.split("\n") if url.strip()]
-        for url in url_list:
-            try:
-                response = requests.get(url)
-                soup = BeautifulSoup(response.content, 'html.parser')
-                url_text = soup.get_text(separator='\n', strip=True)
-                all_text += url_text + "\n"
-                sources.append(url)
-            except Exception as e:
-                st.error(f"Failed to fetch URL {url}: {e}")
-
-        if all_text:
-            chunks = simple_text_splitter(all_text)
-            if chunks:
-                ids = [str(uuid.uuid4()) for _ in chunks]
-                embeddings = embedding_model.encode(chunks, show_progress_bar=True).tolist()
-                metadatas = [{"source": ", ".join(sources)} for _ in chunks]
-                
-                collection.add(
-                    embeddings=embeddings,
-                    documents=chunks,
-                    metadatas=metadatas,
-                    ids=ids
-                )
-                st.success(f"Successfully processed and embedded content from {len(sources)} source(s).")
-            else:
-                st.warning("Could not extract any text to process.")
+    """Queues documents and URLs for background loading, splitting and embedding."""
+    # Sources are keyed by name, so two uploads called b.pdf become "b.pdf" and "b.pdf (2)".
+    taken = set()
+    sources = [Source(name=unique_name(file.name, taken), kind="pdf", data=bytes(file.getbuffer()))
+               for file in files or []]
+    url_list = list(dict.fromkeys(url.strip() for url in urls.split("\n") if url.strip()))
+    sources += [Source(name=url, kind="url") for url in url_list]
+
+    if not sources:
+        st.warning("No new documents or URLs to process.")
+        return
+
+    label = ", ".join(source.name for source in sources[:3]) + (f" and {len(sources) - 3} more" if len(sources) > 3 else "")
+    job_id = job_manager.submit(sources, label)
+    st.success(f"Queued ingestion job #{job_id} for {len(sources)} source(s). You can keep chatting while it runs.")
+
+def show_jobs(polling=False):
+    """Renders recent ingestion jobs with their progress.
+
+    `polling` is True when the fragment was started with `run_every` because
+    jobs were active. Once none are, it reruns the whole app: that re-reads
+    the sources list and selectors, and the rerun starts the fragment
+    without `run_every`, so it stops polling.
+    """
+    if polling and not job_manager.active():
+        st.rerun()
+    jobs = job_manager.jobs()
+    if not jobs:
+        return
+    st.header("📥 Ingestion Jobs")
+    for job in jobs:
+        total = max(job["total_sources"], 1)
+        if job["status"] in ("queued", "running"):
+            eta = f", ETA {job['eta']:.0f}s" if job["eta"] is not None else ""
+            st.progress(
+                min(job["docs_done"] / total, 1.0),
+                text=f"#{job['id']} {job['status']}: {job['docs_parsed']}/{job['total_sources']} parsed, "
+                     f"{job['chunks_embedded']}/{job['chunks_queued']} chunks embedded{eta}"
+            )
         else:
-            st.warning("No new documents or URLs to process.")
+            icon = {"done": "✅", "failed": "❌"}.get(job["status"], "⚠️")
+            with st.expander(f"{icon} #{job['id']} {job['label']}"):
+                st.write(job["message"] or job["status"])
+    stats = embedding_cache.stats()
+    st.caption(f"Embedding cache: {stats['rows']} vector(s), hit ratio {stats['hit_ratio']:.0%}.")
 
 if process_button:
     if not uploaded_files and not url_input:
@@ -140,6 +243,102 @@ if process_button:
     else:
         process_data(uploaded_files, url_input)
 
+with st.sidebar:
+    # Poll for progress while jobs are active, without rerunning the whole app.
+    polling = job_manager.active()
+    st.fragment(show_jobs, run_every=2 if polling else None)(polling=polling)
+    service = embedding_service.stats()
+    st.caption(f"Query encoder: {service['batches']} batch(es), mean size {service['mean_batch_size']:.1f}, "
+               f"queue depth {service['queue_depth']} (peak {service['max_queue_depth']}).")
+
+@st.cache_data
+def list_sources(generation):
+    """Indexed sources with chunk counts; re-read whenever the collection generation changes."""
+    return vector_store.sources()
+
+with st.sidebar:
+    st.header("🗂️ Sources")
+    known_sources = list_sources(read_generation(CHROMA_PERSIST_DIR))
+    source_filter = st.multiselect(
+        "Search only in", sorted(known_sources),
+        help="Restrict retrieval to these sources. Leave empty to search everything."
+    )
+    since = until = None
+    if st.checkbox("Filter by ingest date"):
+        today = datetime.date.today()
+        date_range = st.date_input("Ingested between", (today - datetime.timedelta(days=30), today))
+        if len(date_range) == 2:
+            since = datetime.datetime.combine(date_range[0], datetime.time.min).timestamp()
+            until = datetime.datetime.combine(date_range[1] + datetime.timedelta(days=1), datetime.time.min).timestamp()
+    retrieval_filter = build_where(source_filter, since, until)
+
+    with st.expander("Delete a source"):
+        to_delete = st.selectbox("Source", sorted(known_sources), index=None,
+                                 format_func=lambda name: f"{name} ({known_sources[name]['chunks']} chunks)")
+        if st.button("Delete", disabled=to_delete is None):
+            removed = delete_source(vector_store, to_delete, sparse_index=bm25_index)
+            bump_generation(CHROMA_PERSIST_DIR)
+            st.success(f"Removed {removed} chunk(s) of {to_delete}.")
+
+def stream_answer(client, formatted_prompt, placeholder):
+    """Streams the completion into `placeholder` token by token.
+
+    Returns (answer, timing) where timing holds time-to-first-token and total
+    latency in seconds plus prompt and completion token counts (from the API's
+    usage report, else estimated). If the user sends another message
+    mid-stream, Streamlit stops this run; the stream is closed and the partial
+    answer is kept in the chat history.
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    answer = ""
+    usage = None
+    stream = client.chat.completions.create(
+        model="openai/gpt-oss-20b",
+        messages=[{"role": "user", "content": formatted_prompt}],
+        temperature=0.7,
+        max_tokens=512,
+        stream=True
+    )
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if not delta:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            answer += delta
+            placeholder.markdown(answer + "▌")
+    except Exception:
+        # Ordinary failures (e.g. a dropped connection) are reported by the caller.
+        raise
+    except BaseException:
+        # Streamlit stops a run with a non-Exception BaseException when the user sends another message.
+        if answer:
+            st.session_state.messages.append({"role": "assistant", "content": answer + " _(cancelled)_"})
+        raise
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    placeholder.markdown(answer)
+    end = time.perf_counter()
+    timing = {
+        "ttft": (first_token_at or end) - start,
+        "total": end - start,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or count_tokens(formatted_prompt),
+        "completion_tokens": getattr(usage, "completion_tokens", None) or count_tokens(answer),
+    }
+    return answer, timing
+
+def show_trace(stages):
+    """Renders a turn's per-stage timing breakdown."""
+    with st.expander("⏱️ Timing breakdown"):
+        st.dataframe(stages, hide_index=True, use_container_width=True)
+
 # --- Chat Interface ---
 st.header("💬 Ask Your Questions")
 
@@ -149,6 +348,10 @@ if "messages" not in st.session_state:
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        if message.get("timing"):
+            st.caption(f"⏱️ First token {message['timing']['ttft']:.2f}s · total {message['timing']['total']:.2f}s")
+        if message.get("trace"):
+            show_trace(message["trace"])
 
 if prompt := st.chat_input("What would you like to know?"):
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -160,20 +363,46 @@ if prompt := st.chat_input("What would you like to know?"):
     else:
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            with st.spinner("Thinking..."):
-                try:
+            timing = None
+            cached = None
+            trace = tracer.start("chat", enabled=trace_turns)
+            try:
+                with st.spinner("Thinking..."):
                     # 1. Embed the user's query
-                    query_embedding = embedding_model.encode(prompt).tolist()
-
-                    # 2. Query ChromaDB for relevant context
-                    results = collection.query(
-                        query_embeddings=[query_embedding],
-                        n_results=3 # Retrieve top 3 most relevant chunks
-                    )
-                    
-                    retrieved_docs = results.get('documents', [[]])[0]
-                    context = "\n\n---\n\n".join(retrieved_docs)
-                    
+                    with trace.span("embed_query"):
+                        query_embedding = embedding_service.encode(prompt).tolist()
+
+                    # Reuse the answer to a near-identical question if the collection hasn't changed since
+                    generation = read_generation(CHROMA_PERSIST_DIR)
+                    # Cached answers were built from the whole collection, so filtered questions bypass the cache
+                    with trace.span("answer_cache") as span:
+                        cached = answer_cache.lookup(query_embedding, generation) if retrieval_filter is None else None
+                        span.set(hit=bool(cached))
+
+                    if cached:
+                        full_response, context = cached
+                    else:
+                        # 2. Query the vector store and the BM25 index for candidate chunks
+                        candidate_ids = hybrid_rank(
+                            vector_store, bm25_index, prompt, query_embedding,
+                            n_results=20,
+                            sparse_weight=sparse_weight,
+                            sparse_prefilter=sparse_prefilter,
+                            where=retrieval_filter,
+                            trace=trace
+                        )
+                        # Merge overlapping chunks and pack the most relevant, diverse ones into the budget
+                        context, _ = assemble_context(vector_store, candidate_ids, query_embedding,
+                                                      token_budget=context_budget, trace=trace)
+
+                # Display the source documents before the answer is generated
+                with st.expander("📚 Source Context"):
+                    st.write(context if context else "No relevant context found in the database.")
+
+                if cached:
+                    message_placeholder.markdown(full_response)
+                    st.caption("⚡ Answered from cache for a similar earlier question.")
+                else:
                     # 3. Construct the prompt for the LLM
                     formatted_prompt = f"""
                     Use the following context to answer the question at the end. If you don't know the answer from the context, just say that you don't know.
@@ -187,24 +416,25 @@ if prompt := st.chat_input("What would you like to know?"):
                     Answer in human-readable format.
                     """
 
-                    # 4. Call the Together AI API using the official library
+                    # 4. Stream the answer from the Together AI API using the official library
                     client = Together(api_key=together_api_key)
-                    
-                    response = client.chat.completions.create(
-                        model="openai/gpt-oss-20b",
-                        messages=[{"role": "user", "content": formatted_prompt}],
-                        temperature=0.7,
-                        max_tokens=512
-                    )
-                    
-                    full_response = response.choices[0].message.content
-
-                    # Display the source documents
-                    with st.expander("📚 Source Context"):
-                        st.write(context if context else "No relevant context found in the database.")
-
-                except Exception as e:
-                    full_response = f"An error occurred: {e}"
-
-            message_placeholder.markdown(full_response)
-        st.session_state.messages.append({"role": "assistant", "content": full_response})
+                    with trace.span("llm") as span:
+                        full_response, timing = stream_answer(client, formatted_prompt, message_placeholder)
+                        span.set(ttft_ms=timing["ttft"] * 1000, prompt_tokens=timing["prompt_tokens"],
+                                 completion_tokens=timing["completion_tokens"])
+                    if retrieval_filter is None:
+                        answer_cache.store(query_embedding, full_response, context, generation)
+                    st.caption(f"⏱️ First token {timing['ttft']:.2f}s · total {timing['total']:.2f}s")
+
+            except Exception as e:
+                full_response = f"An error occurred: {e}"
+                message_placeholder.markdown(full_response)
+
+            stages = None
+            if trace.enabled:
+                total_ms = trace.finish(cached=bool(cached))
+                stages = trace.breakdown() + [{"stage": "total", "ms": total_ms, "spans": 1}]
+                show_trace(stages)
+
+        st.session_state.messages.append({"role": "assistant", "content": full_response, "timing": timing,
+                                          "trace": stages})
@@ -0,0 +1,301 @@
+"""
+Ingestion and retrieval benchmarks for the RAG app.
+
+Generates a synthetic PDF/HTML corpus and measures each stage on its own:
+parse throughput, HTML extraction against plain BeautifulSoup (pages/s and
+chunks per page), chunking rate, encode throughput at several batch sizes,
+index write rate and query latency percentiles at increasing index sizes.
+A chat turn is timed end to end with the LLM replaced by a local stub.
+Results are written as JSON so runs can be compared between releases.
+
+    python benchmark.py --docs 200 --scales 10000 100000 1000000 --output bench.json
+"""
+import argparse
+import json
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bm25 import BM25Index
+from html_extract import extract_text
+from ingest import Source, parse_source
+from retrieval import hybrid_search
+from splitter import stream_chunks
+from vector_store import ChromaVectorStore, NumpyVectorStore
+
+_WORDS = (
+    "contract clause payment invoice delivery warranty service customer supplier report quarter revenue "
+    "policy security access network storage backup incident review approval budget schedule milestone "
+    "risk compliance audit training support upgrade license vendor region market product feature release"
+).split()
+
+
+def synthetic_sentence(rng):
+    words = rng.choices(_WORDS, k=rng.randint(8, 20))
+    if rng.random() < 0.1:
+        # Sprinkle in identifiers so the sparse index has exact terms to find.
+        words.append(f"PN-{rng.randint(1000, 9999)}")
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_page(rng, sentences=25):
+    return " ".join(synthetic_sentence(rng) for _ in range(sentences))
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages, line_width=90):
+    """Builds a minimal text-only PDF with one content stream per page."""
+    objects = []
+    page_ids = []
+    font_id = 3
+    for page in pages:
+        lines = [page[i:i + line_width] for i in range(0, len(page), line_width)] or [""]
+        body = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        content_id = 4 + len(objects)
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+        page_id = 4 + len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(page_id)
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    header = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(header + objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def make_html(rng, paragraphs=20):
+    """A page with realistic boilerplate around the content: menus, banners, sidebars and scripts."""
+    body = "".join(f"<p>{synthetic_page(rng, 5)}</p>" for _ in range(paragraphs))
+    links = "".join(f"<li><a href='/section-{i}'>{rng.choice(_WORDS).title()} {rng.choice(_WORDS)}</a></li>"
+                    for i in range(40))
+    nav = f"<nav><ul class='menu'>{links}</ul></nav>"
+    cookie = ("<div class='cookie-banner'>We use cookies to improve your experience. By continuing to browse "
+              "you agree to our use of cookies. <button>Accept all</button> <a href='/privacy'>Settings</a></div>")
+    sidebar = f"<aside class='sidebar'><h3>Related articles</h3><ul>{links}</ul></aside>"
+    script = "<script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);}</script>"
+    footer = f"<footer><p>Copyright. All rights reserved. Privacy policy. Cookie settings.</p><ul>{links}</ul></footer>"
+    return (f"<html><head><title>Doc</title>{script}</head><body>{cookie}<header><h1>Site</h1>{nav}</header>"
+            f"<div class='layout'><main>{body}</main>{sidebar}</div>{footer}{script}</body></html>").encode()
+
+
+def synthetic_corpus(n_docs, pages_per_pdf, html_share, seed=0):
+    rng = random.Random(seed)
+    sources = []
+    for i in range(n_docs):
+        if rng.random() < html_share:
+            sources.append(Source(name=f"https://bench.local/page-{i}", kind="url", data=make_html(rng)))
+        else:
+            pages = [synthetic_page(rng) for _ in range(pages_per_pdf)]
+            sources.append(Source(name=f"doc-{i}.pdf", kind="pdf", data=make_pdf(pages)))
+    return sources
+
+
+def percentiles(latencies):
+    values = np.asarray(latencies) * 1000
+    return {f"p{q}_ms": float(np.percentile(values, q)) for q in (50, 95, 99)}
+
+
+def bench_parse(sources):
+    start = time.perf_counter()
+    documents = [parse_source(Source(s.name, s.kind, s.data)) for s in sources]
+    elapsed = time.perf_counter() - start
+    pages = sum(len(d.pages) for d in documents)
+    size = sum(len(s.data) for s in sources)
+    return documents, {"docs": len(documents), "pages": pages, "seconds": elapsed,
+                       "docs_per_s": len(documents) / elapsed, "pages_per_s": pages / elapsed,
+                       "mb_per_s": size / 1e6 / elapsed}
+
+
+def bench_html(sources):
+    """Compares the lxml main-content extractor with plain BeautifulSoup get_text on the HTML pages."""
+    from bs4 import BeautifulSoup
+
+    pages = [s.data for s in sources if s.kind == "url"]
+    if not pages:
+        return {}
+    extractors = {
+        "bs4_get_text": lambda html: BeautifulSoup(html, "html.parser").get_text(separator="\n", strip=True),
+        "html_extract": extract_text,
+    }
+    results = {}
+    for name, extract in extractors.items():
+        start = time.perf_counter()
+        texts = [extract(html) for html in pages]
+        elapsed = time.perf_counter() - start
+        chunks = sum(1 for i, text in enumerate(texts) for _ in stream_chunks(str(i), [text]))
+        results[name] = {"pages_per_s": len(pages) / elapsed, "chunks_per_page": chunks / len(pages),
+                         "chars_per_page": sum(map(len, texts)) / len(pages)}
+    baseline, extracted = results["bs4_get_text"], results["html_extract"]
+    results["speedup"] = extracted["pages_per_s"] / baseline["pages_per_s"]
+    results["chunk_reduction"] = 1 - extracted["chunks_per_page"] / baseline["chunks_per_page"]
+    return results
+
+
+def bench_chunking(documents):
+    start = time.perf_counter()
+    chunks = [c.text for d in documents for c in stream_chunks(d.source, d.pages)]
+    elapsed = time.perf_counter() - start
+    return chunks, {"chunks": len(chunks), "seconds": elapsed, "chunks_per_s": len(chunks) / elapsed}
+
+
+def bench_encode(model, chunks, batch_sizes):
+    results = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        model.encode(chunks, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        results[str(batch_size)] = {"seconds": elapsed, "chunks_per_s": len(chunks) / elapsed}
+    return results
+
+
+def open_store(backend, path, quantization):
+    if backend == "numpy":
+        return NumpyVectorStore(path, quantization=quantization)
+    import chromadb
+    client = chromadb.PersistentClient(path=path)
+    return ChromaVectorStore(client.get_or_create_collection("benchmark"))
+
+
+def bench_index(backend, scale, dim, queries, texts, path, quantization="none", batch_size=5000):
+    """Fills a fresh store with `scale` random unit vectors and times writes and queries."""
+    rng = np.random.default_rng(scale)
+    store = open_store(backend, path, quantization)
+    sparse = BM25Index(f"{path}/bm25.sqlite3")
+    write_seconds = 0.0
+    for start in range(0, scale, batch_size):
+        n = min(batch_size, scale - start)
+        vectors = rng.normal(size=(n, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [f"c{start + i}" for i in range(n)]
+        docs = [texts[(start + i) % len(texts)] for i in range(n)]
+        began = time.perf_counter()
+        store.upsert(ids=ids, embeddings=vectors.tolist() if backend == "chroma" else vectors,
+                     documents=docs, metadatas=[{"source": "bench"}] * n)
+        sparse.upsert(ids, docs)
+        write_seconds += time.perf_counter() - began
+    began = time.perf_counter()
+    store.flush()
+    write_seconds += time.perf_counter() - began
+
+    query_vectors = rng.normal(size=(queries, dim)).astype(np.float32)
+    dense, hybrid = [], []
+    for i, query in enumerate(query_vectors):
+        began = time.perf_counter()
+        store.query(query.tolist(), 3)
+        dense.append(time.perf_counter() - began)
+        began = time.perf_counter()
+        hybrid_search(store, sparse, texts[i % len(texts)][:80], query.tolist(), n_results=3)
+        hybrid.append(time.perf_counter() - began)
+    return {"vectors": scale, "write_seconds": write_seconds, "writes_per_s": scale / write_seconds,
+            "dense_query": percentiles(dense), "hybrid_query": percentiles(hybrid)}
+
+
+class StubLLM:
+    """Stands in for the Together client; replies with a fixed answer after `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **kwargs):
+        time.sleep(self.delay)
+        message = type("Message", (), {"content": "Stub answer."})()
+        return type("Response", (), {"choices": [type("Choice", (), {"message": message})()]})()
+
+
+def bench_chat_turn(model, store, sparse, questions, llm):
+    latencies = []
+    for question in questions:
+        began = time.perf_counter()
+        embedding = model.encode(question).tolist()
+        docs = hybrid_search(store, sparse, question, embedding, n_results=3)
+        context = "\n\n---\n\n".join(docs)
+        llm.chat.completions.create(model="stub", messages=[{"role": "user", "content": f"{context}\n\n{question}"}])
+        latencies.append(time.perf_counter() - began)
+    return percentiles(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG ingestion and retrieval.")
+    parser.add_argument("--docs", type=int, default=50, help="Synthetic documents to generate")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per synthetic PDF")
+    parser.add_argument("--html-share", type=float, default=0.3, help="Fraction of documents that are HTML pages")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Sentence-transformer name or local path")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--backend", choices=["numpy", "chroma"], default="numpy")
+    parser.add_argument("--quantization", choices=["none", "int8", "binary"], default="none")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    report = {"started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+              "machine": platform.machine(), "args": vars(args)}
+
+    sources = synthetic_corpus(args.docs, args.pages, args.html_share)
+    report["html_extraction"] = bench_html(sources)
+    documents, report["parse"] = bench_parse(sources)
+    chunks, report["chunking"] = bench_chunking(documents)
+
+    began = time.perf_counter()
+    model = SentenceTransformer(args.model)
+    report["model_load_seconds"] = time.perf_counter() - began
+    report["encode"] = bench_encode(model, chunks, args.batch_sizes)
+    dim = model.get_sentence_embedding_dimension()
+
+    report["index"] = []
+    for scale in args.scales:
+        path = tempfile.mkdtemp(prefix="rag-bench-")
+        try:
+            report["index"].append(bench_index(args.backend, scale, dim, args.queries, chunks, path, args.quantization))
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    path = tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        store = open_store(args.backend, path, args.quantization)
+        sparse = BM25Index(f"{path}/bm25.sqlite3")
+        embeddings = model.encode(chunks, batch_size=max(args.batch_sizes))
+        for start in range(0, len(chunks), 5000):
+            ids = [f"c{i}" for i in range(start, min(start + 5000, len(chunks)))]
+            batch = chunks[start:start + 5000]
+            store.upsert(ids=ids, embeddings=embeddings[start:start + 5000].tolist(), documents=batch,
+                         metadatas=[{"source": "bench"}] * len(batch))
+            sparse.upsert(ids, batch)
+        questions = [synthetic_sentence(random.Random(i)) for i in range(min(args.queries, 50))]
+        report["chat_turn_stub_llm"] = bench_chat_turn(model, store, sparse, questions, StubLLM())
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Persisted BM25 inverted index for exact-term retrieval.
+
+Dense embeddings are poor at exact matches such as part numbers, clause IDs
+and names, so every chunk is also indexed here. Postings live in a single
+SQLite file next to the Chroma store and are updated in the same ingestion
+pass, so the two indexes always describe the same chunks.
+
+Queries drop stopwords and terms that occur in most chunks (they carry almost
+no BM25 weight but have the longest postings lists), and the scoring is
+aggregated inside SQLite, so a query costs roughly the length of its rarer
+terms' postings rather than the size of the corpus.
+"""
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+# Keeps identifiers like "AB-1234" or "4.2.1" together as one term.
+_TERM_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both but
+by can could did do does doing down during each few for from further had has have having he her here hers him his
+how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours out
+over own same she should so some such than that the their theirs them then there these they this those through
+to too under until up very was we were what when where which while who whom why will with would you your yours
+""".split())
+
+
+def tokenize(text):
+    """Lower-cased terms; compound identifiers also contribute their parts."""
+    terms = []
+    for term in _TERM_RE.findall(text.lower()):
+        terms.append(term)
+        parts = re.split(r"[-_./]", term)
+        if len(parts) > 1:
+            terms.extend(p for p in parts if p)
+    return terms
+
+
+class BM25Index:
+    """An on-disk BM25 index over chunk IDs."""
+
+    def __init__(self, path, k1=1.5, b=0.75, max_df_ratio=0.5):
+        self.k1 = k1
+        self.b = b
+        # Query terms found in more than this share of chunks are skipped.
+        self.max_df_ratio = max_df_ratio
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, length INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+            CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+        """)
+        with self._conn:
+            # Indexes written before document frequencies were tracked get them once here.
+            if self._stat("docs") and self._conn.execute("SELECT 1 FROM terms LIMIT 1").fetchone() is None:
+                self._conn.execute("INSERT INTO terms (term, df) SELECT term, COUNT(*) FROM postings GROUP BY term")
+
+    def _stat(self, key):
+        row = self._conn.execute("SELECT value FROM stats WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump_stats(self, docs, length):
+        for key, delta in (("docs", docs), ("total_length", length)):
+            self._conn.execute(
+                "INSERT INTO stats (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                (key, delta))
+
+    def _delete(self, ids):
+        removed = removed_length = 0
+        for doc_id in ids:
+            row = self._conn.execute("SELECT length FROM docs WHERE id = ?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            self._conn.execute(
+                "UPDATE terms SET df = df - 1 WHERE term IN (SELECT term FROM postings WHERE doc_id = ?)", (doc_id,))
+            self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+            removed += 1
+            removed_length += row[0]
+        if removed:
+            self._bump_stats(-removed, -removed_length)
+
+    def upsert(self, ids, texts):
+        """Indexes (or re-indexes) the given chunks."""
+        with self._lock, self._conn:
+            self._delete(ids)
+            total = 0
+            for doc_id, text in zip(ids, texts):
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                total += length
+                self._conn.execute("INSERT INTO docs (id, length) VALUES (?, ?)", (doc_id, length))
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    ((term, doc_id, tf) for term, tf in counts.items()))
+                self._conn.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                    ((term,) for term in counts))
+            self._bump_stats(len(ids), total)
+
+    def delete(self, ids):
+        with self._lock, self._conn:
+            self._delete(ids)
+
+    def count(self):
+        with self._lock:
+            return int(self._stat("docs"))
+
+    def _query_terms(self, query, n_docs):
+        """{term: df} for the query terms worth scoring: no stopwords, no near-ubiquitous terms."""
+        terms = set(tokenize(query))
+        content = terms - STOPWORDS or terms
+        if not content:
+            return {}
+        placeholders = ", ".join("?" * len(content))
+        df = dict(self._conn.execute(
+            f"SELECT term, df FROM terms WHERE df > 0 AND term IN ({placeholders})", tuple(content)).fetchall())
+        selective = {term: count for term, count in df.items() if count <= self.max_df_ratio * n_docs}
+        if not selective and df:
+            # Only common terms left: score the rarest so the query still returns something.
+            rarest = min(df, key=df.get)
+            selective = {rarest: df[rarest]}
+        return selective
+
+    def search(self, query, n_results=10):
+        """Returns up to `n_results` (chunk_id, score) pairs, best first."""
+        with self._lock:
+            n_docs = self._stat("docs")
+            if not n_docs:
+                return []
+            terms = self._query_terms(query, n_docs)
+            if not terms:
+                return []
+            avg_length = self._stat("total_length") / n_docs
+            params = {"k1": self.k1, "b": self.b, "avg": avg_length, "n": n_results}
+            for i, (term, df) in enumerate(terms.items()):
+                params[f"t{i}"] = term
+                params[f"w{i}"] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            values = ", ".join(f"(:t{i}, :w{i})" for i in range(len(terms)))
+            rows = self._conn.execute(f"""
+                WITH q(term, idf) AS (VALUES {values})
+                SELECT p.doc_id, SUM(q.idf * p.tf * (:k1 + 1) / (p.tf + :k1 * (1 - :b + :b * d.length / :avg)))
+                    AS score
+                FROM q JOIN postings p ON p.term = q.term JOIN docs d ON d.id = p.doc_id
+                GROUP BY p.doc_id ORDER BY score DESC, p.doc_id LIMIT :n
+            """, params).fetchall()
+        return rows
+
+    def backfill(self, store):
+        """Indexes every chunk already held by a vector store."""
+        for ids, documents in store.iter_documents():
+            self.upsert(ids, documents)
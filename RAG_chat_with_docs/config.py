@@ -0,0 +1,37 @@
+"""
+Storage locations and backend settings shared by the Streamlit app and the
+command-line indexer. Backend options can be overridden with environment
+variables.
+"""
+import os
+
+# Define the persistent directory for ChromaDB
+CHROMA_PERSIST_DIR = "chroma_db_persistent"
+COLLECTION_NAME = "documents_collection"
+BM25_INDEX_PATH = os.path.join(CHROMA_PERSIST_DIR, "bm25.sqlite3")
+JOBS_DB_PATH = os.path.join(CHROMA_PERSIST_DIR, "jobs.sqlite3")
+
+# Vector backend: "chroma" (default) or "numpy" for the in-process flat/IVF index
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma")
+NUMPY_INDEX_DIR = os.path.join(CHROMA_PERSIST_DIR, "numpy_index")
+NUMPY_IVF_LISTS = int(os.getenv("RAG_IVF_LISTS", "0"))
+# Quantized storage for the NumPy backend: "none", "int8" or "binary"
+NUMPY_QUANTIZATION = os.getenv("RAG_QUANTIZATION", "none")
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# A saved copy of the model (see encoder_backends.py --save) is used when present, so startup works offline
+EMBEDDING_MODEL_PATH = os.getenv("RAG_EMBEDDING_MODEL_PATH", os.path.join("models", EMBEDDING_MODEL_NAME))
+# CPU encoder backend: "torch" (default), "int8" (dynamic quantization) or "onnx"
+EMBEDDING_BACKEND = os.getenv("RAG_EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("RAG_EMBEDDING_THREADS", "0"))
+# Backends produce slightly different vectors, so each gets its own embedding cache
+EMBEDDING_CACHE_KEY = EMBEDDING_MODEL_NAME if EMBEDDING_BACKEND == "torch" else f"{EMBEDDING_MODEL_NAME}-{EMBEDDING_BACKEND}"
+EMBEDDING_CACHE_DIR = "embedding_cache"
+# Query micro-batching: how long to wait for concurrent questions and how many to encode together
+EMBED_MAX_WAIT_MS = float(os.getenv("RAG_EMBED_MAX_WAIT_MS", "5"))
+EMBED_MAX_BATCH = int(os.getenv("RAG_EMBED_MAX_BATCH", "32"))
+HTTP_CACHE_DIR = "http_cache"
+
+# Stage-level tracing (see tracing.py): spans are appended to this JSONL file when enabled
+TRACE_PATH = os.path.join(CHROMA_PERSIST_DIR, "traces.jsonl")
+TRACING_ENABLED = os.getenv("RAG_TRACING", "0") == "1"
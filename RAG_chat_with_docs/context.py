@@ -0,0 +1,135 @@
+"""
+Token-budgeted context assembly for the chat prompt.
+
+Instead of pasting a fixed number of raw chunks, the assembler takes a larger
+candidate set, merges chunks from the same source that overlap or sit next to
+each other (so the splitter's overlap is not sent twice), drops redundant
+passages with maximal marginal relevance (MMR), and packs the best ones into
+a token budget.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from splitter import count_tokens
+from tracing import NULL_TRACE
+
+
+@dataclass
+class Passage:
+    """One or more merged chunks from a single source."""
+    source: str
+    page: int
+    offset: int
+    text: str
+    embedding: np.ndarray
+    tokens: int
+
+
+def _overlap(left, right, min_chars=20):
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    limit = min(len(left), len(right))
+    for size in range(limit, min_chars - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def merge_passages(records, max_tokens=600, max_gap=1200):
+    """Merges overlapping or adjacent chunks of the same source into passages.
+
+    `records` are dicts with "document", "metadata" and "embedding". Two
+    chunks from one source merge when their text overlaps, or when the second
+    starts on the same page within `max_gap` characters of the first, as long
+    as the passage stays under `max_tokens`.
+    """
+    by_source = {}
+    for record in records:
+        by_source.setdefault(record["metadata"].get("source", ""), []).append(record)
+
+    passages = []
+    for source, group in by_source.items():
+        group.sort(key=lambda r: (r["metadata"].get("page", 0), r["metadata"].get("offset", 0)))
+        current = None
+        for record in group:
+            meta = record["metadata"]
+            text = record["document"]
+            embedding = _normalize(record["embedding"])
+            if current is not None:
+                overlap = _overlap(current["text"], text)
+                adjacent = (meta.get("page", 0) == current["page"]
+                            and 0 <= meta.get("offset", 0) - current["end"] <= max_gap)
+                addition = text[overlap:] if overlap else " " + text
+                tokens = count_tokens(addition)
+                if (overlap or adjacent) and current["tokens"] + tokens <= max_tokens:
+                    current["text"] += addition
+                    current["tokens"] += tokens
+                    current["embeddings"].append(embedding)
+                    current["end"] = meta.get("offset", 0)
+                    continue
+                passages.append(current)
+            current = {"source": source, "page": meta.get("page", 0), "offset": meta.get("offset", 0),
+                       "end": meta.get("offset", 0), "text": text, "tokens": count_tokens(text),
+                       "embeddings": [embedding]}
+        if current is not None:
+            passages.append(current)
+
+    return [
+        Passage(source=p["source"], page=p["page"], offset=p["offset"], text=p["text"],
+                embedding=_normalize(np.mean(p["embeddings"], axis=0)), tokens=p["tokens"])
+        for p in passages
+    ]
+
+
+def select_mmr(passages, query_embedding, token_budget, diversity=0.3):
+    """Greedily picks passages by MMR until the token budget is spent.
+
+    Each step takes the passage maximizing
+    (1 - diversity) * sim(query, p) - diversity * max sim(p, selected)
+    among those that still fit.
+    """
+    if not passages:
+        return []
+    query = _normalize(query_embedding)
+    matrix = np.stack([p.embedding for p in passages])
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+    remaining = list(range(len(passages)))
+    selected = []
+    budget = token_budget
+    while remaining:
+        fitting = [i for i in remaining if passages[i].tokens <= budget]
+        if not fitting:
+            break
+        if selected:
+            redundancy = similarity[np.ix_(fitting, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(fitting))
+        scores = (1 - diversity) * relevance[fitting] - diversity * redundancy
+        best = fitting[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+        budget -= passages[best].tokens
+    return [passages[i] for i in selected]
+
+
+def assemble_context(store, ranked_ids, query_embedding, token_budget=1500, diversity=0.3, trace=NULL_TRACE):
+    """Builds the prompt context from ranked candidate chunk IDs.
+
+    Returns (context, passages).
+    """
+    with trace.span("context.fetch", chunks=len(ranked_ids)):
+        records = store.get_records(ranked_ids)
+    with trace.span("context.pack") as span:
+        passages = merge_passages([records[i] for i in ranked_ids if i in records],
+                                  max_tokens=max(token_budget // 3, 1))
+        chosen = select_mmr(passages, query_embedding, token_budget, diversity)
+        context = "\n\n---\n\n".join(f"[{p.source}, p. {p.page}]\n{p.text}" for p in chosen)
+        span.set(passages=len(chosen), context_tokens=sum(p.tokens for p in chosen))
+    return context, chosen
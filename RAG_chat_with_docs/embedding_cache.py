@@ -0,0 +1,287 @@
+"""
+Persistent on-disk cache of chunk embeddings.
+
+Vectors live in an append-only float32 matrix that is memory-mapped from disk,
+and a small JSON index maps each chunk's content hash to its row. One cache
+directory is kept per embedding model, so the key is effectively
+(model, chunk hash). When the cache grows past `max_rows`, the least recently
+used rows are evicted and the survivors are copied into a new matrix file;
+the index, which names its matrix file, is rewritten atomically right away,
+so a restart always sees an index and matrix that belong together.
+
+Several processes may share a cache directory. Writes take a lock file, and
+under it each process first re-reads what the others have done: rows are
+reserved in a small state file before they are written, so two processes
+never write the same row, and flush merges the index on disk with this
+process's new entries rather than overwriting it.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from locks import file_lock
+
+
+def text_hash(text):
+    """Content hash used as the cache key for a chunk."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class EmbeddingCache:
+    """A size-bounded, memory-mapped store of embeddings for one model."""
+
+    def __init__(self, cache_dir, model_name, max_rows=200_000):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.path = os.path.join(cache_dir, safe_name)
+        os.makedirs(self.path, exist_ok=True)
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(self.path, "index.json")
+        self._state_path = os.path.join(self.path, "state.json")
+        self._lock_path = os.path.join(self.path, "cache.lock")
+        with file_lock(self._lock_path):
+            self._load()
+
+    def _read_state(self):
+        """{"generation", "rows", "vectors", "dim"} as last reserved by any process, or None."""
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_state(self):
+        tmp_path = self._state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"generation": self._generation, "rows": self.rows,
+                       "vectors": os.path.basename(self._vectors_path), "dim": self.dim}, f)
+        os.replace(tmp_path, self._state_path)
+
+    def _load(self):
+        meta = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        self._index_stamp = _stamp(self._index_path)
+        self.dim = meta.get("dim")
+        self.rows = meta.get("rows", 0)
+        self._tick = meta.get("tick", 0)
+        self._generation = meta.get("generation", 0)
+        vectors_name = meta.get("vectors", "vectors.f32")
+        state = self._read_state()
+        if state and state["generation"] == self._generation:
+            # Rows other processes reserved but have not flushed into the index yet.
+            self.rows = max(self.rows, state["rows"])
+            self.dim = self.dim or state.get("dim")
+            vectors_name = state.get("vectors", vectors_name)
+        self._vectors_path = os.path.join(self.path, vectors_name)
+        # hash -> [row, last_used_tick]
+        self._index = meta.get("index", {})
+        # Keys this process added since its last flush.
+        self._pending = set()
+        self._vectors = None
+        self._capacity = 0
+        if self.dim and os.path.exists(self._vectors_path):
+            self._capacity = os.path.getsize(self._vectors_path) // (self.dim * 4)
+            self._open_vectors()
+
+    def _sync(self):
+        """Catches up with other processes' writes; called with the lock file held."""
+        state = self._read_state()
+        if state and state["generation"] != self._generation:
+            # Another process evicted and compacted: reload, then re-add this process's unflushed vectors.
+            carried = {key: np.array(self._vectors[self._index[key][0]]) for key in self._pending}
+            self._load()
+            carried = {key: vector for key, vector in carried.items() if key not in self._index}
+            if carried:
+                self._append(carried)
+                self._write_state()
+            return
+        stamp = _stamp(self._index_path)
+        if stamp != self._index_stamp:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            for key, entry in meta.get("index", {}).items():
+                self._index.setdefault(key, entry)
+            self._tick = max(self._tick, meta.get("tick", 0))
+            self.dim = self.dim or meta.get("dim")
+            self._index_stamp = stamp
+        if state:
+            self.rows = max(self.rows, state["rows"])
+            self.dim = self.dim or state.get("dim")
+        if self.dim and os.path.exists(self._vectors_path):
+            # Another process may have grown the matrix file.
+            capacity = os.path.getsize(self._vectors_path) // (self.dim * 4)
+            if capacity > self._capacity:
+                self._capacity = capacity
+                self._open_vectors()
+
+    def _open_vectors(self):
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim))
+
+    def _ensure_capacity(self, rows):
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._capacity = capacity
+        self._open_vectors()
+
+    def _append(self, fresh):
+        """Writes {key: vector} at the end of the matrix; the caller holds both locks."""
+        if not fresh:
+            return
+        self._ensure_capacity(self.rows + len(fresh))
+        start = self.rows
+        self._vectors[start:start + len(fresh)] = np.stack(list(fresh.values()))
+        for offset, key in enumerate(fresh):
+            self._tick += 1
+            self._index[key] = [start + offset, self._tick]
+            self._pending.add(key)
+        self.rows += len(fresh)
+
+    def _evict(self, incoming):
+        """Drops least recently used rows so `incoming` new rows fit under max_rows.
+
+        Survivors go to a fresh matrix file and the index is written straight
+        after, so rows on disk are never moved under a saved index.
+        """
+        if self.rows + incoming <= self.max_rows:
+            return
+        keep = max(int(self.max_rows * 0.9) - incoming, 0)
+        survivors = sorted(self._index.items(), key=lambda item: item[1][1], reverse=True)[:keep]
+        survivors.sort(key=lambda item: item[1][0])
+        old_rows = np.array([row for _, (row, _) in survivors], dtype=np.int64)
+
+        generation = self._generation + 1
+        new_path = os.path.join(self.path, f"vectors.{generation}.f32")
+        capacity = max(len(old_rows) + incoming, 1024)
+        with open(new_path, "wb") as f:
+            f.truncate(capacity * self.dim * 4)
+        compacted = np.memmap(new_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        for start in range(0, len(old_rows), 16_384):
+            batch = old_rows[start:start + 16_384]
+            compacted[start:start + len(batch)] = self._vectors[batch]
+        compacted.flush()
+
+        old_path = self._vectors_path
+        self._vectors = compacted
+        self._vectors_path = new_path
+        self._capacity = capacity
+        self._generation = generation
+        self._index = {key: [new_row, tick] for new_row, (key, (_, tick)) in enumerate(survivors)}
+        self.rows = len(survivors)
+        self._pending = set()
+        self._write_index()
+        self._write_state()
+        if os.path.exists(old_path):
+            os.remove(old_path)
+
+    def get_many(self, keys):
+        """Returns a list with the cached vector for each key, or None on a miss."""
+        with self._lock:
+            out = []
+            for key in keys:
+                entry = self._index.get(key)
+                if entry is None:
+                    self.misses += 1
+                    out.append(None)
+                    continue
+                self.hits += 1
+                self._tick += 1
+                entry[1] = self._tick
+                out.append(np.array(self._vectors[entry[0]]))
+            return out
+
+    def put_many(self, keys, vectors):
+        """Appends vectors for keys that are not cached yet."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, file_lock(self._lock_path):
+            self._sync()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            fresh = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index:
+                    fresh[key] = vector
+            if not fresh:
+                return
+            self._evict(len(fresh))
+            self._append(fresh)
+            # Reserve the rows before anyone else can take them.
+            self._write_state()
+
+    def flush(self):
+        """Writes the matrix and the index, merged with other processes' flushed entries, to disk."""
+        with self._lock, file_lock(self._lock_path):
+            self._sync()
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._write_index()
+            self._pending = set()
+
+    def _write_index(self):
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "rows": self.rows, "tick": self._tick,
+                       "generation": self._generation, "vectors": os.path.basename(self._vectors_path),
+                       "index": self._index}, f)
+        os.replace(tmp_path, self._index_path)
+        self._index_stamp = _stamp(self._index_path)
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"rows": self.rows, "max_rows": self.max_rows, "hits": self.hits,
+                "misses": self.misses, "hit_ratio": self.hit_ratio()}
+
+
+class CachedEncoder:
+    """Wraps a SentenceTransformer so cached texts never reach `encode`."""
+
+    def __init__(self, model, cache):
+        self.model = model
+        self.cache = cache
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        if not texts:
+            return np.empty((0, self.cache.dim or 0), dtype=np.float32)
+        keys = [text_hash(t) for t in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # Duplicate texts within one call are only encoded once.
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], texts[i])
+            encoded = np.asarray(self.model.encode(list(unique.values()), **kwargs), dtype=np.float32)
+            by_key = dict(zip(unique.keys(), encoded))
+            self.cache.put_many(list(by_key.keys()), encoded)
+            for i in missing:
+                vectors[i] = by_key[keys[i]]
+        result = np.stack(vectors).astype(np.float32, copy=False)
+        return result[0] if single else result
@@ -0,0 +1,85 @@
+"""
+Shared query-embedding service with dynamic micro-batching.
+
+Each chat turn encodes a single question. With many sessions on one server,
+those batch-size-1 forward passes would run back to back, so the service
+collects concurrent requests on a queue, waits up to `max_wait_ms` (or until
+`max_batch` texts are waiting), encodes them as one batch and hands every
+caller its own row.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class BatchingEncoder:
+    """Coalesces concurrent `encode` calls into batched model calls.
+
+    Exposes the same `encode(texts)` shape as a SentenceTransformer: a string
+    returns one vector, a list returns a matrix.
+    """
+
+    def __init__(self, model, max_wait_ms=5.0, max_batch=32):
+        self.model = model
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_depth = 0
+        self._worker = threading.Thread(target=self._work, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        futures = []
+        for text in [texts] if single else texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        with self._lock:
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        vectors = [future.result() for future in futures]
+        if single:
+            return vectors[0]
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    def _work(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            texts = [text for text, _ in batch]
+            try:
+                vectors = np.asarray(self.model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+
+    def stats(self):
+        """Current queue depth, peak depth, batches run and mean batch size."""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+            }
@@ -0,0 +1,154 @@
+"""
+CPU inference backends for the sentence-transformer encoder.
+
+* "torch": the reference eager PyTorch model.
+* "int8": the same model with its Linear layers dynamically quantized to int8.
+* "onnx": ONNX Runtime through sentence-transformers' ONNX backend (needs
+  `pip install "sentence-transformers[onnx]"`), with the intra-op thread
+  count set on the session. A model without an ONNX file is exported on
+  load; exports of a local copy are saved next to it so they happen once.
+
+Models load from a local directory when one exists, so the app starts
+offline. Save one with `--save` (which also stores the ONNX export), then
+compare backends for load time, encode throughput and agreement with the
+reference embeddings:
+
+    python encoder_backends.py --save models/all-MiniLM-L6-v2
+    python encoder_backends.py --model models/all-MiniLM-L6-v2 --texts 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ENCODER_BACKENDS = ("torch", "int8", "onnx")
+
+
+def resolve_model(name, local_path=None):
+    """Prefers a saved local copy of the model over downloading it by name."""
+    if local_path and os.path.isdir(local_path):
+        return local_path
+    return name
+
+
+def load_encoder(model, backend="torch", threads=0):
+    """Loads a SentenceTransformer on the CPU with the given backend.
+
+    `threads` caps intra-op parallelism (0 keeps the library default).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend {backend!r}; expected one of {ENCODER_BACKENDS}")
+    if threads:
+        torch.set_num_threads(threads)
+    if backend == "onnx":
+        return _load_onnx(model, threads)
+    encoder = SentenceTransformer(model, device="cpu")
+    if backend == "int8":
+        torch.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return encoder
+
+
+def _load_onnx(model, threads):
+    import onnxruntime
+    from sentence_transformers import SentenceTransformer
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    encoder = SentenceTransformer(model, device="cpu", backend="onnx",
+                                  model_kwargs={"session_options": options, "provider": "CPUExecutionProvider"})
+    if os.path.isdir(model) and not os.path.exists(os.path.join(model, "onnx", "model.onnx")):
+        # Keep the export with the local copy, where the ONNX backend looks first, so cold starts skip it.
+        encoder[0].auto_model.save_pretrained(os.path.join(model, "onnx"))
+    return encoder
+
+
+def agreement(reference, candidate):
+    """Row-wise cosine similarity between two embedding matrices (min and mean)."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosine = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1) + 1e-12)
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+
+def main():
+    from benchmark import synthetic_sentence
+
+    parser = argparse.ArgumentParser(description="Compare encoder backends for load time, throughput and agreement.")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Sentence-transformer name or local path")
+    parser.add_argument("--backends", nargs="+", choices=ENCODER_BACKENDS, default=list(ENCODER_BACKENDS))
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (0 keeps the default)")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Fail if a backend's embeddings drift further than this from the PyTorch reference's")
+    parser.add_argument("--save", metavar="DIR",
+                        help="Download the model, save it (and its ONNX export, if onnx is in --backends) "
+                             "to DIR for offline use and exit")
+    args = parser.parse_args()
+
+    if args.save:
+        load_encoder(args.model).save(args.save)
+        if "onnx" in args.backends:
+            try:
+                # Loading the saved copy exports it and writes onnx/model.onnx into it.
+                load_encoder(args.save, "onnx")
+            except ImportError as e:
+                print(f"Skipped the ONNX export: {e}", file=sys.stderr)
+        print(f"Saved {args.model} to {args.save}")
+        return 0
+
+    rng = random.Random(0)
+    texts = [" ".join(synthetic_sentence(rng) for _ in range(rng.randint(1, 6))) for _ in range(args.texts)]
+    reference = None
+    drifted = []
+
+    # The eager "torch" model is the reference, so it always runs first, listed or not.
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+
+    print(f"{'backend':<8}{'load s':>8}{'texts/s':>10}{'1-text ms':>11}{'min cos':>9}{'mean cos':>10}")
+    for backend in backends:
+        began = time.perf_counter()
+        try:
+            encoder = load_encoder(args.model, backend, args.threads)
+        except Exception as e:
+            print(f"{backend:<8} unavailable: {e}")
+            continue
+        load_seconds = time.perf_counter() - began
+
+        encoder.encode(texts[:args.batch_size], batch_size=args.batch_size)  # warm-up
+        began = time.perf_counter()
+        embeddings = encoder.encode(texts, batch_size=args.batch_size)
+        throughput = len(texts) / (time.perf_counter() - began)
+        began = time.perf_counter()
+        for text in texts[:50]:
+            encoder.encode(text)
+        single_ms = (time.perf_counter() - began) * 1000 / min(50, len(texts))
+
+        if backend == "torch":
+            reference = embeddings
+        if reference is None:
+            print(f"{backend:<8}{load_seconds:>8.2f}{throughput:>10.1f}{single_ms:>11.2f}{'-':>9}{'-':>10}")
+            continue
+        scores = agreement(reference, embeddings)
+        if scores["min_cosine"] < args.min_cosine:
+            drifted.append(backend)
+        print(f"{backend:<8}{load_seconds:>8.2f}{throughput:>10.1f}{single_ms:>11.2f}"
+              f"{scores['min_cosine']:>9.4f}{scores['mean_cosine']:>10.4f}")
+    if drifted:
+        print(f"Embeddings disagree with torch for: {', '.join(drifted)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
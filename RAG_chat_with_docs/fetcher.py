@@ -0,0 +1,152 @@
+"""
+URL fetching for ingestion.
+
+All requests share one pooled `requests.Session` with connect and read
+timeouts. A HostScheduler hands URLs to the pipeline's fetch workers only
+while their host has a free slot, so URLs for a slow or rate-limited host
+wait in the scheduler instead of holding workers other hosts could use; the
+fetcher's own per-host semaphore still guards direct callers. Responses are
+kept in an on-disk HTTP cache: re-fetching a page sends `If-None-Match` /
+`If-Modified-Since`, and a 304 reply is reported as not modified so the
+pipeline can skip re-parsing.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+@dataclass
+class FetchResult:
+    url: str
+    content: bytes
+    content_type: str = ""
+    not_modified: bool = False
+
+
+def host_of(url):
+    return urlsplit(url).netloc
+
+
+class HostScheduler:
+    """Releases items in order, but never more than `per_host` in flight for one host.
+
+    `next()` blocks until an item whose host has a free slot is available and
+    returns None once everything has been handed out; call `release(item)`
+    when an item's request is finished. Items whose `host(item)` is None are
+    not limited.
+    """
+
+    def __init__(self, items, per_host, host):
+        self.per_host = per_host
+        self._host = host
+        self._queues = OrderedDict()
+        for item in items:
+            self._queues.setdefault(host(item), deque()).append(item)
+        self._active = {}
+        self._cond = threading.Condition()
+
+    def next(self):
+        with self._cond:
+            while True:
+                if not self._queues:
+                    return None
+                for host, items in self._queues.items():
+                    if host is None or self._active.get(host, 0) < self.per_host:
+                        item = items.popleft()
+                        if not items:
+                            del self._queues[host]
+                        if host is not None:
+                            self._active[host] = self._active.get(host, 0) + 1
+                        return item
+                self._cond.wait()
+
+    def release(self, item):
+        host = self._host(item)
+        if host is None:
+            return
+        with self._cond:
+            self._active[host] -= 1
+            self._cond.notify()
+
+
+class UrlFetcher:
+    """Thread-safe fetcher with connection pooling, per-host limits and a conditional GET cache."""
+
+    def __init__(self, cache_dir=None, max_connections=16, per_host=2, connect_timeout=5, read_timeout=20):
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.per_host = per_host
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = host_of(url)
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _cache_paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".json"), os.path.join(self.cache_dir, key + ".body")
+
+    def _read_cache(self, url):
+        if not self.cache_dir:
+            return None
+        meta_path, body_path = self._cache_paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return meta, body_path
+
+    def _write_cache(self, url, response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not self.cache_dir or not (etag or last_modified):
+            return
+        meta_path, body_path = self._cache_paths(url)
+        with open(body_path + ".tmp", "wb") as f:
+            f.write(response.content)
+        os.replace(body_path + ".tmp", body_path)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified,
+                "content_type": response.headers.get("Content-Type", "")}
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def fetch(self, url):
+        """GETs `url`, revalidating against the cache when possible."""
+        headers = {}
+        cached = self._read_cache(url)
+        if cached:
+            meta, _ = cached
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        with self._host_slot(url):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and cached:
+            meta, body_path = cached
+            with open(body_path, "rb") as f:
+                content = f.read()
+            return FetchResult(url, content, meta.get("content_type", ""), not_modified=True)
+        response.raise_for_status()
+        self._write_cache(url, response)
+        return FetchResult(url, response.content, response.headers.get("Content-Type", ""))
@@ -0,0 +1,152 @@
+"""
+Main-content text extraction for fetched HTML pages.
+
+Pages are parsed with lxml (a C parser, much faster than BeautifulSoup's
+html.parser). Scripts and styles are dropped, then navigation, headers,
+footers, sidebars and elements with a boilerplate class or id token (cookie
+banners, menus, share bars, ...), unless they hold most of the page's words.
+The main content is then taken from <main>, <article> or role="main", falling
+back to the block with the most non-link text. If lxml is not installed or
+cannot parse the page, or the result keeps too little of the page's text,
+the whole page's text is taken with BeautifulSoup instead.
+"""
+import re
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # pragma: no cover - optional dependency
+    lxml = None
+
+_DROP_TAGS = ("script", "style", "noscript", "template", "svg", "iframe", "button", "select")
+_LAYOUT_TAGS = ("nav", "footer", "aside")
+# Matched against whole class/id tokens and their first or last "-"/"_" part, so
+# "cookie-banner" and "site-footer" match but "has-sidebar-layout" does not.
+_BOILERPLATE_WORDS = frozenset({
+    "cookie", "cookies", "consent", "banner", "navbar", "nav", "menu", "menus", "breadcrumb", "breadcrumbs",
+    "footer", "header", "sidebar", "share", "sharing", "social", "subscribe", "newsletter", "advert",
+    "adverts", "advertisement", "promo", "related", "comment", "comments", "popup", "modal", "skip-link"
+})
+_TOKEN_PART_RE = re.compile(r"[-_]+")
+_BLOCK_TAGS = ("p", "div", "section", "article", "main", "li", "ul", "ol", "pre", "blockquote", "table",
+               "tr", "h1", "h2", "h3", "h4", "h5", "h6", "br", "dd", "dt")
+_MIN_MAIN_WORDS = 40
+# Never drop an element holding more than this share of the body's words.
+_MAX_DROP_SHARE = 0.5
+# Below this share of the page's words, the extraction is distrusted.
+_MIN_KEPT_SHARE = 0.25
+
+
+def _word_counts(root):
+    """Words of text and of link text under every element, in one bottom-up pass."""
+    elements = list(root.iter())
+    words, link_words = {}, {}
+    for element in reversed(elements):  # descendants come before their ancestors
+        total = len((element.text or "").split()) if isinstance(element.tag, str) else 0
+        links = 0
+        for child in element:
+            total += words.get(child, 0) + len((child.tail or "").split())
+            links += link_words.get(child, 0)
+        words[element] = total
+        link_words[element] = total if element.tag == "a" else links
+    return words, link_words
+
+
+def _is_boilerplate(marker):
+    for token in marker.lower().split():
+        parts = _TOKEN_PART_RE.split(token)
+        if token in _BOILERPLATE_WORDS or parts[0] in _BOILERPLATE_WORDS or parts[-1] in _BOILERPLATE_WORDS:
+            return True
+    return False
+
+
+def _body(root):
+    body = root.find(".//body")
+    return body if body is not None else root
+
+
+def _strip_boilerplate(root):
+    """Drops layout and boilerplate elements and returns the body's word count before doing so."""
+    for element in root.xpath("|".join(f"//{tag}" for tag in _DROP_TAGS)):
+        element.drop_tree()
+    words, _ = _word_counts(root)
+    body_words = words[_body(root)]
+
+    def droppable(element):
+        # Counts are from before any drop, so they only overstate what an element still holds.
+        return element.getparent() is not None and words.get(element, 0) <= _MAX_DROP_SHARE * body_words
+
+    # Page-level headers go; an article's own header usually carries its title.
+    for element in root.xpath("|".join(f"//{tag}" for tag in _LAYOUT_TAGS)
+                              + "|//header[not(ancestor::article or ancestor::main)]"):
+        if droppable(element):
+            element.drop_tree()
+    for element in root.xpath("//*[@class or @id or @role or @aria-hidden]"):
+        if not droppable(element) or element.tag in ("html", "body", "main", "article"):
+            continue
+        if element.xpath(".//main|.//article"):
+            # A wrapper around the content, whatever its class says.
+            continue
+        if (_is_boilerplate(f"{element.get('class', '')} {element.get('id', '')}")
+                or element.get("aria-hidden") == "true"
+                or element.get("role") in ("navigation", "banner", "contentinfo", "complementary")):
+            element.drop_tree()
+    return body_words
+
+
+def _main_content(root):
+    """The element holding the page's main text."""
+    words, link_words = _word_counts(root)
+    for path in ("//main", "//article", "//*[@role='main']"):
+        candidates = root.xpath(path)
+        if candidates:
+            best = max(candidates, key=lambda element: words.get(element, 0))
+            if words.get(best, 0) >= _MIN_MAIN_WORDS:
+                return best
+    # Otherwise score blocks by text that is not link text; nested blocks compete with their parents.
+    best, best_score = None, 0
+    for element in root.iter("div", "section", "td"):
+        score = words[element] - 2 * link_words[element]
+        if score > best_score:
+            best, best_score = element, score
+    body = _body(root)
+    if best is None or best_score < 0.5 * words[body]:
+        return body
+    return best
+
+
+def _block_text(element):
+    # Separate block-level elements with newlines so paragraphs survive for the splitter.
+    for block in element.iter(*_BLOCK_TAGS):
+        block.tail = "\n" + (block.tail or "")
+        if block.tag != "br":
+            block.text = "\n" + (block.text or "")
+    lines = (" ".join(line.split()) for line in element.text_content().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _extract_with_soup(html):
+    """The whole page's text, as ingestion extracted it before main-content detection."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup(_DROP_TAGS):
+        element.decompose()
+    return soup.get_text(separator="\n", strip=True)
+
+
+def extract_text(html):
+    """Returns the main text of an HTML page (bytes or str), one block per line."""
+    if not html:
+        return ""
+    if lxml is not None:
+        try:
+            root = lxml.html.fromstring(html)
+        except (etree.ParserError, ValueError):
+            root = None
+        if root is not None:
+            page_words = _strip_boilerplate(root)
+            text = _block_text(_main_content(root))
+            if text and len(text.split()) >= _MIN_KEPT_SHARE * page_words:
+                return text
+    return _extract_with_soup(html)
@@ -0,0 +1,231 @@
+"""
+Headless bulk indexer for the RAG store.
+
+Indexes a directory tree of PDFs and/or a list of URLs into the same store the
+Streamlit app uses, through the same ingestion pipeline. PDFs are parsed on
+every core with a process pool, embeddings are batched, and finished sources
+are checkpointed so an interrupted run resumes where it stopped. The stores
+are flushed before every checkpoint save, so a source is only recorded as
+done once its vectors are on disk.
+
+    python index_cli.py ./archive --urls urls.txt --workers 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from answer_cache import bump_generation
+from bm25 import BM25Index
+from config import (
+    BM25_INDEX_PATH, CHROMA_PERSIST_DIR, COLLECTION_NAME, EMBEDDING_BACKEND, EMBEDDING_CACHE_DIR, EMBEDDING_MODEL_NAME,
+    EMBEDDING_MODEL_PATH, EMBEDDING_THREADS, HTTP_CACHE_DIR, NUMPY_INDEX_DIR, NUMPY_IVF_LISTS, NUMPY_QUANTIZATION,
+    TRACE_PATH, TRACING_ENABLED, VECTOR_BACKEND
+)
+from embedding_cache import CachedEncoder, EmbeddingCache
+from encoder_backends import ENCODER_BACKENDS, load_encoder, resolve_model
+from fetcher import UrlFetcher
+from locks import StoreLockedError, lock_directory
+from ingest import Source, run_pipeline
+from tracing import Tracer
+from vector_store import open_vector_store
+
+CHECKPOINT_PATH = os.path.join(CHROMA_PERSIST_DIR, "index_checkpoint.json")
+
+
+def discover_pdfs(paths):
+    """Yields every PDF under the given files and directories, in a stable order."""
+    for path in paths:
+        if os.path.isfile(path):
+            yield os.path.normpath(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    yield os.path.normpath(os.path.join(root, name))
+
+
+def file_signature(path):
+    """Changes whenever the file is modified, so edited PDFs are re-indexed."""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class Checkpoint:
+    """Remembers finished sources across runs in a small JSON file.
+
+    `mark` only notes a source as written; it is recorded as done by
+    `commit`, which callers run once the stores holding its chunks have been
+    flushed, so a resumed run never skips a source that was only in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._marked = {}
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = json.load(f).get("done", {})
+
+    def is_done(self, name, signature):
+        return self.done.get(name) == signature
+
+    def mark(self, name, signature):
+        with self._lock:
+            self._marked[name] = signature
+
+    def take_marked(self):
+        """The sources marked since the last call; take them before flushing, commit them after."""
+        with self._lock:
+            marked, self._marked = self._marked, {}
+        return marked
+
+    def commit(self, marked):
+        with self._lock:
+            self.done.update(marked)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"done": self.done}, f)
+            os.replace(self.path + ".tmp", self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-index PDFs and URLs into the RAG store.")
+    parser.add_argument("paths", nargs="*", help="PDF files or directories to index recursively")
+    parser.add_argument("--urls", help="Text file with one URL per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes used to parse PDFs")
+    parser.add_argument("--batch-size", type=int, default=128, help="Chunks per embedding batch")
+    parser.add_argument("--model", default=resolve_model(EMBEDDING_MODEL_NAME, EMBEDDING_MODEL_PATH),
+                        help="Sentence-transformer name or local path")
+    parser.add_argument("--backend", choices=ENCODER_BACKENDS, default=EMBEDDING_BACKEND, help="CPU encoder backend")
+    parser.add_argument("--threads", type=int, default=EMBEDDING_THREADS, help="Encoder intra-op threads")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and revisit every source")
+    parser.add_argument("--checkpoint-every", type=float, default=60.0,
+                        help="Seconds between flushing the stores and saving the checkpoint")
+    parser.add_argument("--trace", action="store_true", default=TRACING_ENABLED,
+                        help=f"Record stage spans to {TRACE_PATH} and print a per-stage breakdown")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    urls = []
+    if args.urls:
+        with open(args.urls, "r", encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not args.paths and not urls:
+        parser.error("Give at least one PDF path or --urls file.")
+
+    def chroma_collection():
+        import chromadb
+        client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
+        return client.get_or_create_collection(name=COLLECTION_NAME)
+
+    os.makedirs(CHROMA_PERSIST_DIR, exist_ok=True)
+    try:
+        # Held until exit: the app and this CLI must not write the same stores at once, whatever the backend.
+        lock_directory(CHROMA_PERSIST_DIR)
+    except StoreLockedError as e:
+        parser.exit(1, f"error: {e}\n")
+    store = open_vector_store(VECTOR_BACKEND, collection_factory=chroma_collection, path=NUMPY_INDEX_DIR,
+                              ivf_lists=NUMPY_IVF_LISTS, quantization=NUMPY_QUANTIZATION)
+    sparse_index = BM25Index(BM25_INDEX_PATH)
+    if sparse_index.count() == 0 and store.count() > 0:
+        sparse_index.backfill(store)
+    # Share the app's cache when indexing with its model, whether named or loaded from the local copy.
+    model_name = EMBEDDING_MODEL_NAME if args.model in (EMBEDDING_MODEL_NAME, EMBEDDING_MODEL_PATH) else args.model
+    cache_key = model_name if args.backend == "torch" else f"{model_name}-{args.backend}"
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, cache_key)
+    encoder = CachedEncoder(load_encoder(args.model, args.backend, args.threads), embedding_cache)
+
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.restart:
+        checkpoint.done = {}
+    signatures = {}
+    resumed = [0]
+
+    def sources():
+        # A generator, so PDFs are only read from disk as the pipeline pulls them.
+        for path in discover_pdfs(args.paths):
+            signature = file_signature(path)
+            if checkpoint.is_done(path, signature):
+                resumed[0] += 1
+                continue
+            signatures[path] = signature
+            yield Source(name=path, kind="pdf", path=path)
+        for url in urls:
+            # URLs are always revisited; the HTTP cache makes unchanged ones cheap.
+            signatures[url] = "url"
+            yield Source(name=url, kind="url")
+
+    started = time.perf_counter()
+    finished = [0]
+    last_report = [started]
+    last_checkpoint = [started]
+
+    def flush_and_checkpoint():
+        # Taken before the flush, so every source committed has all its chunks in it.
+        marked = checkpoint.take_marked()
+        store.flush()
+        embedding_cache.flush()
+        checkpoint.commit(marked)
+
+    def on_source_done(name):
+        checkpoint.mark(name, signatures.get(name, ""))
+        finished[0] += 1
+        now = time.perf_counter()
+        if now - last_checkpoint[0] >= args.checkpoint_every:
+            last_checkpoint[0] = now
+            flush_and_checkpoint()
+        if now - last_report[0] >= args.report_every:
+            last_report[0] = now
+            elapsed = now - started
+            print(f"[{elapsed:7.1f}s] {finished[0]} source(s) done, {finished[0] / elapsed:.1f} docs/s", flush=True)
+
+    trace = Tracer(TRACE_PATH).start("bulk_index", enabled=args.trace, workers=args.workers)
+
+    # Spawned workers are safe to start while the pipeline's threads are running.
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+            result = run_pipeline(
+                sources(), encoder, store,
+                batch_size=args.batch_size,
+                parse_workers=args.workers,
+                sparse_index=sparse_index,
+                fetcher=UrlFetcher(cache_dir=HTTP_CACHE_DIR),
+                parse_executor=pool,
+                on_source_done=on_source_done,
+                trace=trace
+            )
+    finally:
+        flush_and_checkpoint()
+
+    if result.chunks or result.deleted:
+        bump_generation(CHROMA_PERSIST_DIR)
+
+    elapsed = time.perf_counter() - started
+    for error in result.errors:
+        print(f"error: {error}", file=sys.stderr)
+    stats = embedding_cache.stats()
+    print(f"Indexed {len(result.sources)} source(s) in {elapsed:.1f}s "
+          f"({len(result.sources) / elapsed:.1f} docs/s, {result.chunks / elapsed:.1f} chunks/s)")
+    print(f"  chunks: {result.chunks} new, {result.skipped} unchanged, {result.deleted} removed")
+    print(f"  skipped from checkpoint: {resumed[0]}, not modified URLs: {len(result.unchanged)}")
+    print(f"  embedding cache hit ratio: {stats['hit_ratio']:.0%}, errors: {len(result.errors)}")
+    if trace.enabled:
+        trace.finish(sources=len(result.sources), chunks=result.chunks)
+        # Stages run concurrently, so their busy times overlap and can exceed the wall time.
+        print("  stage busy time:")
+        for stage in trace.breakdown():
+            print(f"    {stage['stage']:<16}{stage['ms'] / 1000:>9.1f}s over {stage['spans']} span(s)")
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
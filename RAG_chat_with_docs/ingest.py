@@ -0,0 +1,329 @@
+"""
+Staged ingestion pipeline for the RAG app.
+
+Sources flow through fetch -> parse -> chunk -> embed -> write. Every stage
+has its own pool of worker threads and hands work to the next stage through a
+bounded queue, so embedding one batch overlaps with parsing the next document
+and only a few documents are ever held in memory at once.
+"""
+import hashlib
+import io
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+from pypdf import PdfReader
+
+from fetcher import HostScheduler, UrlFetcher, host_of
+from html_extract import extract_text
+from splitter import stream_chunks
+from tracing import NULL_TRACE
+
+# Marks the end of a stage's output on its queue.
+_DONE = object()
+
+
+@dataclass
+class Source:
+    """A PDF upload, PDF file on disk or URL waiting to be ingested."""
+    name: str
+    kind: str  # "pdf" or "url"
+    data: bytes = b""
+    # Set for PDFs on disk; the fetch stage reads them lazily.
+    path: str = ""
+
+
+@dataclass
+class Document:
+    """Plain text extracted from one source, one string per page."""
+    source: str
+    pages: list
+
+
+@dataclass
+class ChunkBatch:
+    """A batch of chunks travelling from the chunk stage to the writer."""
+    source: str
+    chunks: list
+    ids: list
+    # (page, offset) of each chunk within its source.
+    positions: list = field(default_factory=list)
+    embeddings: list = None
+    stale_ids: list = field(default_factory=list)
+
+
+@dataclass
+class IngestionResult:
+    """Summary of a pipeline run, reported back to the UI."""
+    sources: list = field(default_factory=list)
+    # URLs that answered 304 Not Modified and were not re-parsed.
+    unchanged: list = field(default_factory=list)
+    chunks: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    errors: list = field(default_factory=list)
+
+
+def unique_name(name, taken):
+    """`name`, or `name (2)`, `name (3)`, ... if it is already in `taken`; the result is added to `taken`."""
+    unique, n = name, 1
+    while unique in taken:
+        n += 1
+        unique = f"{name} ({n})"
+    taken.add(unique)
+    return unique
+
+
+def chunk_id(source, offset, text):
+    """Derives a stable chunk ID from its source, position ("page:offset") and content.
+
+    Re-ingesting an unchanged document yields the same IDs, which lets the
+    pipeline skip chunks that are already stored.
+    """
+    digest = hashlib.sha256(f"{source}\0{offset}\0{text}".encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+def plan_source_update(store, source, ids):
+    """Splits a source's freshly computed chunk IDs against what is stored.
+
+    Returns (new_ids, stale_ids): IDs that still need embedding, and stored IDs
+    for this source that no longer appear in it.
+    """
+    stored = store.ids_for_source(source)
+    new_ids = {i for i in ids if i not in stored}
+    stale_ids = sorted(stored.difference(ids))
+    return new_ids, stale_ids
+
+
+def delete_source(store, source, sparse_index=None):
+    """Removes every chunk of one source from the store (and BM25 index); returns the count."""
+    ids = sorted(store.ids_for_source(source))
+    if ids:
+        store.delete(ids)
+        if sparse_index is not None:
+            sparse_index.delete(ids)
+        store.flush()
+    return len(ids)
+
+
+def parse_source(source):
+    """Extracts plain text from a fetched PDF or HTML page."""
+    if source.kind == "pdf":
+        reader = PdfReader(io.BytesIO(source.data))
+        pages = [page.extract_text() or "" for page in reader.pages]
+    else:
+        pages = [extract_text(source.data)]
+    # The raw bytes are no longer needed once parsed.
+    source.data = b""
+    return Document(source=source.name, pages=pages)
+
+
+def _run_stage(name, func, inbox, outbox, workers, result, lock):
+    """Starts `workers` threads that apply `func` to every item on `inbox`.
+
+    `func` returns an iterable of items for `outbox`. The last worker to see
+    the end marker forwards it downstream so the next stage can shut down.
+    """
+    remaining = [workers]
+
+    def worker():
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # Let sibling workers see the marker too.
+                inbox.put(_DONE)
+                break
+            try:
+                for out in func(item):
+                    if outbox is not None:
+                        outbox.put(out)
+            except Exception as e:
+                label = getattr(item, "name", None) or getattr(item, "source", "")
+                with lock:
+                    result.errors.append(f"{name} failed for {label}: {e}")
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and outbox is not None:
+            outbox.put(_DONE)
+
+    threads = [threading.Thread(target=worker, name=f"ingest-{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_pipeline(sources, embedding_model, store, batch_size=64, queue_size=8,
+                 fetch_workers=8, parse_workers=4, embed_workers=1, splitter=stream_chunks,
+                 sparse_index=None, fetcher=None, parse_executor=None, on_source_done=None,
+                 on_progress=None, trace=NULL_TRACE):
+    """Runs `sources` through the staged pipeline and writes them to `store`.
+
+    `store` is a vector store from vector_store.py. If `sparse_index` (a
+    BM25Index) is given, the writer keeps it in step with the store. URLs are
+    downloaded with `fetcher` (a UrlFetcher); the fetch stage's worker count
+    bounds how many downloads run at once, and sources are queued for it
+    through a HostScheduler, so a saturated host never ties up workers.
+
+    With `parse_executor` (e.g. a ProcessPoolExecutor), parse workers hand
+    documents to it so parsing can use every core. `on_source_done(name)` is
+    called once all of a source's chunks are written, which lets callers
+    checkpoint progress. `on_progress(event, count)` reports "parsed"
+    documents, "chunked" chunks queued for embedding and "embedded" chunks
+    written. Stage timings and counts are recorded as spans on `trace` (see
+    tracing.py).
+
+    The writer stage is a single thread, since the stores are not safe for
+    concurrent writes. Returns an IngestionResult.
+    """
+    result = IngestionResult()
+    lock = threading.Lock()
+    to_fetch, to_parse, to_chunk, to_embed, to_write = (queue.Queue(maxsize=queue_size) for _ in range(5))
+
+    if fetcher is None:
+        fetcher = UrlFetcher(max_connections=fetch_workers)
+
+    # Batches still to be written per source, for on_source_done.
+    outstanding = {}
+
+    def source_done(name):
+        if on_source_done is not None:
+            on_source_done(name)
+
+    def progress(event, count):
+        if on_progress is not None:
+            on_progress(event, count)
+
+    def source_host(source):
+        return host_of(source.name) if source.kind == "url" else None
+
+    scheduler = HostScheduler(sources, fetcher.per_host, source_host)
+
+    def fetch(source):
+        with trace.span("fetch", kind=source.kind) as span:
+            try:
+                if source.path and not source.data:
+                    with open(source.path, "rb") as f:
+                        source.data = f.read()
+                fetched = fetcher.fetch(source.name) if source.kind == "url" else None
+            finally:
+                scheduler.release(source)
+            span.set(bytes=len((fetched.content if fetched else source.data) or b""),
+                     not_modified=bool(fetched and fetched.not_modified))
+        if fetched is not None:
+            # An unchanged page whose chunks are already stored needs no re-parsing.
+            if fetched.not_modified and store.ids_for_source(source.name):
+                with lock:
+                    result.unchanged.append(source.name)
+                source_done(source.name)
+                return
+            source.data = fetched.content
+        yield source
+
+    def parse(source):
+        with trace.span("parse." + source.kind) as span:
+            if parse_executor is not None:
+                document = parse_executor.submit(parse_source, source).result()
+            else:
+                document = parse_source(source)
+            span.set(pages=len(document.pages))
+        progress("parsed", 1)
+        yield document
+
+    def chunk(document):
+        with trace.span("chunk") as span:
+            # The splitter consumes pages lazily; only this document's chunks are held.
+            chunks = list(splitter(document.source, document.pages))
+            ids = [chunk_id(c.source, f"{c.page}:{c.offset}", c.text) for c in chunks]
+            span.set(chunks=len(chunks))
+        if not chunks:
+            source_done(document.source)
+            return
+        with trace.span("plan_update") as span:
+            new_ids, stale_ids = plan_source_update(store, document.source, ids)
+            pending = [(i, c) for i, c in zip(ids, chunks) if i in new_ids]
+            span.set(new=len(pending), stale=len(stale_ids))
+        n_batches = (len(pending) + batch_size - 1) // batch_size or (1 if stale_ids else 0)
+        with lock:
+            result.sources.append(document.source)
+            result.skipped += len(chunks) - len(pending)
+            outstanding[document.source] = n_batches
+        progress("chunked", len(pending))
+        if not n_batches:
+            source_done(document.source)
+        if stale_ids and not pending:
+            yield ChunkBatch(source=document.source, chunks=[], ids=[], stale_ids=stale_ids)
+        for n in range(0, len(pending), batch_size):
+            batch = pending[n:n + batch_size]
+            yield ChunkBatch(
+                source=document.source,
+                chunks=[c.text for _, c in batch],
+                ids=[i for i, _ in batch],
+                positions=[(c.page, c.offset) for _, c in batch],
+                # Stale chunks ride along with the first batch of their source.
+                stale_ids=stale_ids if n == 0 else [],
+            )
+
+    def embed(batch):
+        if batch.chunks:
+            with trace.span("embed", chunks=len(batch.chunks)):
+                batch.embeddings = embedding_model.encode(batch.chunks).tolist()
+        yield batch
+
+    def write(batch):
+        if batch.stale_ids:
+            with trace.span("write.delete", chunks=len(batch.stale_ids)):
+                store.delete(batch.stale_ids)
+                if sparse_index is not None:
+                    sparse_index.delete(batch.stale_ids)
+        if batch.chunks:
+            ingested_at = time.time()
+            with trace.span("write.vectors", chunks=len(batch.chunks)):
+                store.upsert(
+                    ids=batch.ids,
+                    embeddings=batch.embeddings,
+                    documents=batch.chunks,
+                    metadatas=[{"source": batch.source, "page": page, "offset": offset, "ingested_at": ingested_at}
+                               for page, offset in batch.positions]
+                )
+            if sparse_index is not None:
+                with trace.span("write.bm25", chunks=len(batch.chunks)):
+                    sparse_index.upsert(batch.ids, batch.chunks)
+        with lock:
+            result.chunks += len(batch.chunks)
+            result.deleted += len(batch.stale_ids)
+            outstanding[batch.source] -= 1
+            finished = outstanding[batch.source] == 0
+        progress("embedded", len(batch.chunks))
+        if finished:
+            source_done(batch.source)
+        return ()
+
+    threads = []
+    threads += _run_stage("fetch", fetch, to_fetch, to_parse, fetch_workers, result, lock)
+    threads += _run_stage("parse", parse, to_parse, to_chunk, parse_workers, result, lock)
+    threads += _run_stage("chunk", chunk, to_chunk, to_embed, 1, result, lock)
+    threads += _run_stage("embed", embed, to_embed, to_write, embed_workers, result, lock)
+    threads += _run_stage("write", write, to_write, None, 1, result, lock)
+
+    # Only hosts with a free slot get a source queued, so fetch workers never wait on a host.
+    seen = set()
+    while (source := scheduler.next()) is not None:
+        if source.name in seen:
+            # Two sources under one name would each delete the other's chunks as stale.
+            scheduler.release(source)
+            with lock:
+                result.errors.append(f"Skipped {source.name}: another source in this run has the same name")
+            source_done(source.name)
+            continue
+        seen.add(source.name)
+        to_fetch.put(source)
+    to_fetch.put(_DONE)
+
+    for thread in threads:
+        thread.join()
+    with trace.span("flush"):
+        store.flush()
+    return result
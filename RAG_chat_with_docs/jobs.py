@@ -0,0 +1,127 @@
+"""
+Background ingestion jobs.
+
+Uploads are handed to a JobManager, which runs them one at a time on a worker
+thread outside the Streamlit script, so reruns neither block on nor abort the
+work. Every job and its progress counters live in a small SQLite table, and
+the UI polls it for documents parsed, chunks embedded and an ETA. Chunks are
+committed batch by batch, so chat queries already see the finished part of a
+job while it is still running.
+"""
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+
+_COUNTERS = ("docs_parsed", "docs_done", "chunks_queued", "chunks_embedded")
+
+
+class JobManager:
+    """Runs ingestion jobs sequentially and records their progress in SQLite.
+
+    `runner(sources, on_progress, on_source_done)` does the actual work and
+    returns an IngestionResult; `on_finished(result)` runs after each job,
+    before it is marked finished.
+    """
+
+    def __init__(self, db_path, runner, on_finished=None):
+        self.runner = runner
+        self.on_finished = on_finished
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    status TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    total_sources INTEGER NOT NULL,
+                    docs_parsed INTEGER NOT NULL DEFAULT 0,
+                    docs_done INTEGER NOT NULL DEFAULT 0,
+                    chunks_queued INTEGER NOT NULL DEFAULT 0,
+                    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+                    message TEXT
+                )
+            """)
+            # Uploads only lived in the previous process's memory, so its unfinished jobs cannot resume.
+            self._conn.execute(
+                "UPDATE jobs SET status = 'interrupted', finished_at = ? WHERE status IN ('queued', 'running')",
+                (time.time(),))
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._work, name="ingest-jobs", daemon=True)
+        self._worker.start()
+
+    def submit(self, sources, label):
+        """Queues an ingestion job and returns its ID."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (status, label, created_at, total_sources) VALUES ('queued', ?, ?, ?)",
+                (label, time.time(), len(sources)))
+            job_id = cursor.lastrowid
+        self._queue.put((job_id, sources))
+        return job_id
+
+    def _update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _increment(self, job_id, counter, count):
+        if counter not in _COUNTERS:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {counter} = {counter} + ? WHERE id = ?", (count, job_id))
+
+    def _work(self):
+        while True:
+            job_id, sources = self._queue.get()
+            self._update(job_id, status="running", started_at=time.time())
+            try:
+                result = self.runner(
+                    sources,
+                    on_progress=lambda event, count: self._increment(job_id, {
+                        "parsed": "docs_parsed", "chunked": "chunks_queued", "embedded": "chunks_embedded"
+                    }.get(event), count),
+                    on_source_done=lambda name: self._increment(job_id, "docs_done", 1),
+                )
+                message = (f"{result.chunks} new chunk(s), {result.skipped} unchanged, "
+                           f"{result.deleted} removed from {len(result.sources)} source(s)")
+                if result.unchanged:
+                    message += f"; {len(result.unchanged)} URL(s) not modified since the last fetch"
+                elif not result.sources and not result.errors:
+                    message = "Could not extract any text to process."
+                if result.errors:
+                    message += "\n" + "\n".join(result.errors)
+                # Before the status update, so a UI that sees the job finish also sees its effects.
+                if self.on_finished is not None:
+                    self.on_finished(result)
+                self._update(job_id, status="failed" if result.errors and not result.sources else "done",
+                             finished_at=time.time(), message=message)
+            except Exception:
+                self._update(job_id, status="failed", finished_at=time.time(), message=traceback.format_exc())
+
+    def jobs(self, limit=5):
+        """Most recent jobs as dicts, with an `eta` in seconds for running ones."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        jobs = []
+        now = time.time()
+        for row in rows:
+            job = dict(row)
+            job["eta"] = None
+            if job["status"] == "running" and job["docs_done"]:
+                elapsed = now - job["started_at"]
+                job["eta"] = elapsed / job["docs_done"] * (job["total_sources"] - job["docs_done"])
+            jobs.append(job)
+        return jobs
+
+    def active(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()
+        return row[0] > 0
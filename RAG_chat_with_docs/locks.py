@@ -0,0 +1,82 @@
+"""
+Cross-process file locks for the on-disk stores.
+
+`lock_directory` claims a directory for the life of the process, for stores
+that are held in memory and written back whole (the NumPy index, and the
+persist directory as a whole, which the app and the CLIs must not share).
+A second process gets StoreLockedError naming the holder's pid. The OS
+drops the lock when the holder exits, even if it crashes.
+
+`file_lock` is a blocking lock for short critical sections, for stores that
+several processes may update in turn (the embedding cache).
+"""
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class StoreLockedError(RuntimeError):
+    """The directory is already claimed by another process."""
+
+
+_held = {}
+_held_guard = threading.Lock()
+
+
+def _lock(handle, blocking):
+    handle.seek(0)
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+
+
+def _unlock(handle):
+    handle.seek(0)
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def lock_directory(path, name="store.lock"):
+    """Claims `path` for this process until it exits, or raises StoreLockedError.
+
+    Claiming a directory this process already holds is a no-op.
+    """
+    os.makedirs(path, exist_ok=True)
+    lock_path = os.path.realpath(os.path.join(path, name))
+    with _held_guard:
+        if lock_path in _held:
+            return
+        handle = open(lock_path, "a+", encoding="utf-8")
+        try:
+            _lock(handle, blocking=False)
+        except OSError:
+            handle.seek(0)
+            holder = handle.read().strip()
+            handle.close()
+            raise StoreLockedError(
+                f"{path} is in use by another process{f' (pid {holder})' if holder else ''}; "
+                "stop it and try again.") from None
+        handle.truncate(0)
+        handle.write(str(os.getpid()))
+        handle.flush()
+        _held[lock_path] = handle
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on the file at `path` (created if missing) for the `with` block."""
+    with open(path, "a+", encoding="utf-8") as handle:
+        _lock(handle, blocking=True)
+        try:
+            yield
+        finally:
+            _unlock(handle)
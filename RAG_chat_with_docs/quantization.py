@@ -0,0 +1,137 @@
+"""
+Quantized vector codes for the NumPy vector store.
+
+Two compact storage modes for the index vectors:
+
+* "int8": scalar quantization, one signed byte per dimension (4x smaller).
+* "binary": one sign bit per dimension, compared by Hamming distance (32x smaller).
+
+The store runs a coarse search over the codes, then rescores a shortlist
+against the full-precision vectors, which can stay memory-mapped on disk.
+
+Run this module to measure recall@k of each mode against exact search:
+
+    python quantization.py chroma_db_persistent/numpy_index --k 10
+"""
+import argparse
+import time
+
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# Rows scored per block, so int8 codes are never upcast all at once.
+_BLOCK_ROWS = 65536
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Fewer rows than this say too little about each dimension's range to fit it.
+INT8_MIN_FIT_ROWS = 1000
+
+
+def fit_int8(vectors, min_rows=INT8_MIN_FIT_ROWS):
+    """Per-dimension (minimum, step) used to map values onto 256 levels.
+
+    With fewer than `min_rows` rows the fixed range of unit vectors, [-1, 1],
+    is used instead; otherwise the observed range is padded by 5% on each
+    side so later vectors are rarely clipped.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+    if len(vectors) < min_rows:
+        return np.full(dim, -1.0, dtype=np.float32), np.full(dim, 2.0 / 255.0, dtype=np.float32)
+    minimum = vectors.min(axis=0)
+    maximum = vectors.max(axis=0)
+    margin = 0.05 * (maximum - minimum)
+    minimum, maximum = np.maximum(minimum - margin, -1.0), np.minimum(maximum + margin, 1.0)
+    step = (maximum - minimum) / 255.0
+    step[step <= 0] = 2.0 / 255.0
+    return minimum.astype(np.float32), step.astype(np.float32)
+
+
+def encode_int8(vectors, params):
+    minimum, step = params
+    levels = np.rint((np.asarray(vectors, dtype=np.float32) - minimum) / step)
+    return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+
+def int8_scores(codes, query, params):
+    """Approximate dot products; the per-query constant term is dropped, so only the order is exact."""
+    _, step = params
+    weights = (np.asarray(query, dtype=np.float32) * step).astype(np.float32)
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), _BLOCK_ROWS):
+        block = codes[start:start + _BLOCK_ROWS]
+        scores[start:start + len(block)] = block.astype(np.float32) @ weights
+    return scores
+
+
+def encode_binary(vectors):
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+def hamming_distances(codes, query_code):
+    xor = np.bitwise_xor(codes, query_code)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[xor].sum(axis=1, dtype=np.int32)
+
+
+def coarse_scores(mode, codes, query, params=None):
+    """Scores where higher is better, for either quantization mode."""
+    if mode == "int8":
+        return int8_scores(codes, query, params)
+    return -hamming_distances(codes, encode_binary(np.asarray(query)[None, :])[0]).astype(np.float32)
+
+
+def code_bytes(mode, n_rows, dim):
+    if mode == "int8":
+        return n_rows * dim
+    if mode == "binary":
+        return n_rows * ((dim + 7) // 8)
+    return n_rows * dim * 4
+
+
+def recall_at_k(store, queries, k=10):
+    """Mean fraction of the exact top-k that `store.query` returns for each query."""
+    vectors = np.asarray(store.vectors)
+    hits = 0
+    for query in queries:
+        query = query / (np.linalg.norm(query) or 1.0)
+        exact = np.argpartition(-(vectors @ query), k - 1)[:k]
+        expected = {store.ids[i] for i in exact}
+        hits += len(expected.intersection(store.query(query, k)))
+    return hits / (k * len(queries))
+
+
+def main():
+    from vector_store import NumpyVectorStore
+
+    parser = argparse.ArgumentParser(description="Recall@k of quantized search against exact search.")
+    parser.add_argument("path", help="Directory of a NumPy vector store")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    baseline = NumpyVectorStore(args.path)
+    if not baseline.count():
+        parser.error(f"No vectors found in {args.path}")
+    rng = np.random.default_rng(0)
+    rows = rng.choice(baseline.count(), min(args.queries, baseline.count()), replace=False)
+    # Perturb stored vectors so queries are near, but not on, indexed points.
+    vectors = np.asarray(baseline.vectors)
+    queries = vectors[rows] + rng.normal(scale=0.05, size=(len(rows), vectors.shape[1])).astype(np.float32)
+
+    print(f"{'mode':<8}{'recall@' + str(args.k):>10}{'ms/query':>10}{'code MB':>10}")
+    for mode in QUANTIZATION_MODES:
+        store = NumpyVectorStore(args.path, quantization=mode, rescore_factor=args.rescore_factor)
+        start = time.perf_counter()
+        for query in queries:
+            store.query(query, args.k)
+        elapsed = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = recall_at_k(store, queries, args.k)
+        size = code_bytes(mode, store.count(), vectors.shape[1]) / 1e6
+        print(f"{mode:<8}{recall:>10.3f}{elapsed:>10.2f}{size:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Hybrid retrieval: BM25 and dense vector search fused with reciprocal-rank fusion.
+"""
+from tracing import NULL_TRACE
+
+
+def reciprocal_rank_fusion(rankings, weights, k=60):
+    """Fuses ranked ID lists; each list contributes weight / (k + rank) per ID."""
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def hybrid_rank(store, sparse_index, query_text, query_embedding, n_results=3,
+                sparse_weight=0.5, candidates=20, sparse_prefilter=False, where=None, trace=NULL_TRACE):
+    """Returns the IDs of the top `n_results` chunks for a query, best first.
+
+    `sparse_weight` sets the BM25 share of the fusion (0 is dense only, 1 is
+    BM25 only). With `sparse_prefilter`, dense scoring is restricted to the
+    BM25 candidates, which avoids a full vector scan on big collections.
+    A `where` metadata filter (see vector_store.build_where) is pushed down
+    into the vector search and applied to the BM25 hits.
+    """
+    sparse_ids = []
+    if sparse_weight > 0:
+        with trace.span("retrieve.bm25") as span:
+            if where is None:
+                sparse_ids = [doc_id for doc_id, _ in sparse_index.search(query_text, candidates)]
+            else:
+                # Over-fetch keyword hits, since some fall outside the filter.
+                hits = [doc_id for doc_id, _ in sparse_index.search(query_text, candidates * 5)]
+                allowed = store.filter_ids(hits, where)
+                sparse_ids = [doc_id for doc_id in hits if doc_id in allowed][:candidates]
+            span.set(hits=len(sparse_ids))
+
+    dense_ids = []
+    if sparse_weight < 1:
+        with trace.span("retrieve.vectors", filtered=where is not None) as span:
+            if sparse_prefilter and sparse_ids:
+                dense_ids = store.query(query_embedding, candidates, candidate_ids=sparse_ids, where=where)
+            else:
+                dense_ids = store.query(query_embedding, candidates, where=where)
+            span.set(hits=len(dense_ids))
+
+    return reciprocal_rank_fusion([dense_ids, sparse_ids], [1 - sparse_weight, sparse_weight])[:n_results]
+
+
+def hybrid_search(store, sparse_index, query_text, query_embedding, n_results=3, **options):
+    """Like hybrid_rank, but returns the documents themselves."""
+    fused = hybrid_rank(store, sparse_index, query_text, query_embedding, n_results, **options)
+    if not fused:
+        return []
+    by_id = store.get_documents(fused)
+    return [by_id[doc_id] for doc_id in fused if doc_id in by_id]
@@ -0,0 +1,254 @@
+"""
+Index snapshots: build once, ship to many nodes.
+
+A snapshot is a directory holding
+
+* vectors.npy   - float32 embedding matrix, row i belongs to ids[i]
+* records.npz   - columnar ids, documents and metadata; strings are stored
+                  Arrow-style as one UTF-8 buffer plus offsets, source is
+                  dictionary encoded, page, offset and ingested_at are typed
+                  columns and any other keys go to a JSON string column
+* bm25.sqlite3  - a copy of the BM25 index, so it need not be rebuilt; it is
+                  restored with SQLite's backup API into the existing index
+* manifest.json - format version, row count, dimension, embedding model and
+                  the size and SHA-256 of every file
+
+Importing verifies the checksums, then loads the vectors memory-mapped. For
+the NumPy backend the matrix file is copied into place as-is; for Chroma it
+is streamed in batches from the memory map.
+
+    python snapshot.py export snapshots/2024-06-01
+    python snapshot.py import snapshots/2024-06-01 --replace
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+_TYPED_COLUMNS = {"page": np.int32, "offset": np.int64, "ingested_at": np.float64}
+_MISSING = {"page": -1, "offset": -1, "ingested_at": np.nan}
+
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _pack_strings(strings):
+    """Concatenates strings into one UTF-8 buffer plus an offsets array."""
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(data, offsets):
+    buffer = data.tobytes()
+    return [buffer[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def _encode_metadata(metadatas):
+    """Splits metadata dicts into compact typed columns."""
+    sources = {}
+    source_codes = np.fromiter((sources.setdefault(m.get("source", ""), len(sources)) for m in metadatas),
+                               dtype=np.int32, count=len(metadatas))
+    names, name_offsets = _pack_strings(list(sources))
+    columns = {"source_codes": source_codes, "source_names": names, "source_name_offsets": name_offsets}
+    for name, dtype in _TYPED_COLUMNS.items():
+        columns[name] = np.array([m.get(name, _MISSING[name]) for m in metadatas], dtype=dtype)
+    known = {"source", *_TYPED_COLUMNS}
+    extra = [{k: v for k, v in m.items() if k not in known} for m in metadatas]
+    if any(extra):
+        columns["extra"], columns["extra_offsets"] = _pack_strings([json.dumps(e) if e else "" for e in extra])
+    return columns
+
+
+def _decode_metadata(columns, n):
+    names = _unpack_strings(columns["source_names"], columns["source_name_offsets"])
+    codes = columns["source_codes"]
+    typed = {name: columns[name].tolist() for name in _TYPED_COLUMNS}
+    extra = _unpack_strings(columns["extra"], columns["extra_offsets"]) if "extra" in columns else [""] * n
+    metadatas = []
+    for i in range(n):
+        meta = {"source": names[codes[i]]}
+        for name in _TYPED_COLUMNS:
+            value = typed[name][i]
+            if value != _MISSING[name] and value == value:  # value == value filters NaN
+                meta[name] = value
+        if extra[i]:
+            meta.update(json.loads(extra[i]))
+        metadatas.append(meta)
+    return metadatas
+
+
+def export_snapshot(store, out_dir, model_name, sparse_index_path=None):
+    """Writes the whole store (and optionally the BM25 index) to `out_dir`; returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    n = store.count()
+    ids, documents, metadatas = [], [], []
+    vectors = None
+    row = 0
+    for page_ids, embeddings, page_documents, page_metadatas in store.iter_records():
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(os.path.join(out_dir, "vectors.npy"), mode="w+",
+                                                dtype=np.float32, shape=(n, embeddings.shape[1]))
+        vectors[row:row + len(page_ids)] = embeddings
+        row += len(page_ids)
+        ids.extend(page_ids)
+        documents.extend(page_documents)
+        metadatas.extend(page_metadatas)
+    if vectors is None:
+        raise ValueError("The index is empty; nothing to export.")
+    if row != n:
+        raise RuntimeError(f"The index changed during export ({row} rows read, {n} expected).")
+    norms = np.linalg.norm(vectors[:min(n, 1000)], axis=1)
+    normalized = bool(np.allclose(norms, 1.0, atol=1e-3))
+    dim = vectors.shape[1]
+    vectors.flush()
+    del vectors
+
+    id_data, id_offsets = _pack_strings(ids)
+    document_data, document_offsets = _pack_strings(documents)
+    np.savez_compressed(os.path.join(out_dir, "records.npz"), ids=id_data, id_offsets=id_offsets,
+                        documents=document_data, document_offsets=document_offsets, **_encode_metadata(metadatas))
+
+    files = ["vectors.npy", "records.npz"]
+    if sparse_index_path and os.path.exists(sparse_index_path):
+        # The backup API gives a consistent copy even while the index is open elsewhere.
+        source = sqlite3.connect(sparse_index_path)
+        target = sqlite3.connect(os.path.join(out_dir, "bm25.sqlite3"))
+        with target:
+            source.backup(target)
+        target.execute("PRAGMA journal_mode=DELETE")
+        source.close()
+        target.close()
+        files.append("bm25.sqlite3")
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "embedding_model": model_name,
+        "count": n,
+        "dim": dim,
+        "normalized": normalized,
+        "files": {name: {"bytes": os.path.getsize(os.path.join(out_dir, name)),
+                         "sha256": file_digest(os.path.join(out_dir, name))} for name in files},
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_snapshot(snapshot_dir, verify=True):
+    """Checks the manifest and returns (manifest, vectors, ids, documents, metadatas).
+
+    `vectors` is memory-mapped, so opening even a very large snapshot is cheap.
+    """
+    with open(os.path.join(snapshot_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format_version')!r}")
+    for name, info in manifest["files"].items():
+        path = os.path.join(snapshot_dir, name)
+        if os.path.getsize(path) != info["bytes"] or (verify and file_digest(path) != info["sha256"]):
+            raise ValueError(f"Snapshot file {name} is corrupt or incomplete")
+    vectors = np.load(os.path.join(snapshot_dir, "vectors.npy"), mmap_mode="r")
+    with np.load(os.path.join(snapshot_dir, "records.npz")) as records:
+        columns = {name: records[name] for name in records.files}
+    ids = _unpack_strings(columns["ids"], columns["id_offsets"])
+    documents = _unpack_strings(columns["documents"], columns["document_offsets"])
+    if vectors.shape != (manifest["count"], manifest["dim"]) or len(ids) != manifest["count"]:
+        raise ValueError("Snapshot row counts do not match its manifest")
+    return manifest, vectors, ids, documents, _decode_metadata(columns, len(ids))
+
+
+def import_snapshot(snapshot_dir, store, sparse_index_path=None, verify=True, batch_size=5000):
+    """Loads a snapshot into an empty (or to-be-replaced) store; returns the manifest."""
+    from vector_store import NumpyVectorStore
+
+    manifest, vectors, ids, documents, metadatas = read_snapshot(snapshot_dir, verify)
+    if isinstance(store, NumpyVectorStore) and manifest["normalized"]:
+        store.replace_all(os.path.join(snapshot_dir, "vectors.npy"), ids, documents, metadatas)
+    else:
+        existing = [doc_id for page_ids, _ in store.iter_documents() for doc_id in page_ids]
+        if existing:
+            store.delete(existing)
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            store.upsert(ids=ids[start:end], embeddings=np.asarray(vectors[start:end]).tolist(),
+                         documents=documents[start:end], metadatas=metadatas[start:end])
+        store.flush()
+
+    if sparse_index_path and "bm25.sqlite3" in manifest["files"]:
+        # Restored through SQLite rather than copied over the file, so its WAL and any open readers stay consistent.
+        source = sqlite3.connect(os.path.join(snapshot_dir, "bm25.sqlite3"))
+        target = sqlite3.connect(sparse_index_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+    return manifest
+
+
+def main():
+    from answer_cache import bump_generation
+    from config import (
+        BM25_INDEX_PATH, CHROMA_PERSIST_DIR, COLLECTION_NAME, EMBEDDING_CACHE_KEY, NUMPY_INDEX_DIR,
+        NUMPY_IVF_LISTS, NUMPY_QUANTIZATION, VECTOR_BACKEND
+    )
+    from locks import StoreLockedError, lock_directory
+    from vector_store import open_vector_store
+
+    parser = argparse.ArgumentParser(description="Export or import a snapshot of the RAG index.")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot directory")
+    parser.add_argument("--replace", action="store_true", help="Allow import over a non-empty index")
+    parser.add_argument("--no-verify", action="store_true", help="Skip checksum verification on import")
+    args = parser.parse_args()
+
+    def chroma_collection():
+        import chromadb
+        client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
+        return client.get_or_create_collection(name=COLLECTION_NAME)
+
+    os.makedirs(CHROMA_PERSIST_DIR, exist_ok=True)
+    try:
+        # Held until exit: the app and this CLI must not write the same stores at once, whatever the backend.
+        lock_directory(CHROMA_PERSIST_DIR)
+    except StoreLockedError as e:
+        parser.exit(1, f"error: {e}\n")
+    store = open_vector_store(VECTOR_BACKEND, collection_factory=chroma_collection, path=NUMPY_INDEX_DIR,
+                              ivf_lists=NUMPY_IVF_LISTS, quantization=NUMPY_QUANTIZATION)
+    started = time.perf_counter()
+    if args.action == "export":
+        manifest = export_snapshot(store, args.path, EMBEDDING_CACHE_KEY, BM25_INDEX_PATH)
+        size = sum(info["bytes"] for info in manifest["files"].values()) / 1e6
+        print(f"Exported {manifest['count']} chunk(s) to {args.path} ({size:.1f} MB) "
+              f"in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    if store.count() and not args.replace:
+        parser.error(f"The index already holds {store.count()} chunk(s); pass --replace to overwrite it.")
+    with open(os.path.join(args.path, "manifest.json"), "r", encoding="utf-8") as f:
+        model = json.load(f).get("embedding_model")
+    if model != EMBEDDING_CACHE_KEY:
+        print(f"warning: snapshot was built with {model}, this node encodes queries with {EMBEDDING_CACHE_KEY}",
+              file=sys.stderr)
+    manifest = import_snapshot(args.path, store, BM25_INDEX_PATH, verify=not args.no_verify)
+    bump_generation(CHROMA_PERSIST_DIR)
+    print(f"Imported {manifest['count']} chunk(s) from {args.path} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
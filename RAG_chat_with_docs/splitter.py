@@ -0,0 +1,108 @@
+"""
+Streaming, boundary-aware text splitter.
+
+Pages are consumed lazily and cut into paragraphs and sentences, which are
+packed into chunks under a token budget. Chunks never cut a sentence in half
+unless a single sentence is longer than the whole budget, and each chunk
+remembers the source, page and character offset it starts at. Only the
+chunk being built is held in memory, whatever the size of the corpus.
+"""
+import re
+from dataclasses import dataclass
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"[^\n]+?(?:[.!?]+(?=\s|$)|(?=\n)|$)")
+
+
+@dataclass
+class Chunk:
+    """A piece of a document sized for embedding."""
+    source: str
+    page: int
+    offset: int
+    text: str
+
+
+def count_tokens(text):
+    """Approximates the tokenizer: one token per word or punctuation mark."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def _units(page_text):
+    """Yields (offset, text, starts_paragraph) for each sentence on a page."""
+    position = 0
+    for paragraph in _PARAGRAPH_RE.split(page_text):
+        paragraph_start = page_text.find(paragraph, position)
+        position = paragraph_start + len(paragraph)
+        first = True
+        for match in _SENTENCE_RE.finditer(paragraph):
+            raw = match.group()
+            sentence = raw.strip()
+            if sentence:
+                # The offset is where the sentence's text starts, not the whitespace before it.
+                leading = len(raw) - len(raw.lstrip())
+                yield paragraph_start + match.start() + leading, " ".join(sentence.split()), first
+                first = False
+
+
+def _split_long(text, max_tokens, count):
+    """Hard-splits a sentence that alone exceeds the budget on word boundaries.
+
+    Yields (relative_offset, piece) pairs.
+    """
+    piece, start, position = [], 0, 0
+    for word in text.split(" "):
+        piece.append(word)
+        if len(piece) > 1 and count(" ".join(piece)) > max_tokens:
+            yield start, " ".join(piece[:-1])
+            piece, start = [word], position
+        position += len(word) + 1
+    if piece:
+        yield start, " ".join(piece)
+
+
+def stream_chunks(source, pages, max_tokens=200, overlap_tokens=30, count=count_tokens):
+    """Yields Chunks for one source from an iterable of page texts.
+
+    `pages` may be any iterable, e.g. a generator over a PDF's pages. Chunks
+    may span page boundaries; the last sentences of each chunk, up to
+    `overlap_tokens`, are repeated at the start of the next one.
+    """
+    buffer = []  # (page, offset, text, tokens, starts_paragraph)
+    buffer_tokens = 0
+
+    def emit():
+        parts = []
+        for i, (_, _, text, _, new_paragraph) in enumerate(buffer):
+            if i:
+                parts.append("\n\n" if new_paragraph else " ")
+            parts.append(text)
+        page, offset = buffer[0][0], buffer[0][1]
+        return Chunk(source=source, page=page, offset=offset, text="".join(parts))
+
+    for page_number, page_text in enumerate(pages, start=1):
+        if not page_text:
+            continue
+        for offset, sentence, new_paragraph in _units(page_text):
+            tokens = count(sentence)
+            pieces = [(offset, sentence, tokens)]
+            if tokens > max_tokens:
+                pieces = [(offset + start, p, count(p)) for start, p in _split_long(sentence, max_tokens, count)]
+            for piece_offset, piece, piece_tokens in pieces:
+                if buffer and buffer_tokens + piece_tokens > max_tokens:
+                    yield emit()
+                    # Carry trailing sentences over as overlap.
+                    carried, carried_tokens = [], 0
+                    for unit in reversed(buffer):
+                        if carried_tokens + unit[3] > overlap_tokens or carried_tokens + unit[3] + piece_tokens > max_tokens:
+                            break
+                        carried.insert(0, unit)
+                        carried_tokens += unit[3]
+                    buffer, buffer_tokens = carried, carried_tokens
+                buffer.append((page_number, piece_offset, piece, piece_tokens, new_paragraph))
+                buffer_tokens += piece_tokens
+                new_paragraph = False
+
+    if buffer:
+        yield emit()
@@ -0,0 +1,77 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def vector_for(key, dim=8):
+    seed = int(key.split("-")[1])
+    return np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+
+
+def test_eviction_keeps_every_survivor_on_its_own_vector(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model", max_rows=100)
+    keys = [f"k-{i}" for i in range(350)]
+    for start in range(0, len(keys), 30):
+        batch = keys[start:start + 30]
+        cache.put_many(batch, [vector_for(key) for key in batch])
+        # Touch a few old keys so eviction order is not just insertion order.
+        cache.get_many(keys[:5])
+    assert cache.rows <= 100
+
+    def check(cache):
+        found = 0
+        for key, vector in zip(keys, cache.get_many(keys)):
+            if vector is not None:
+                np.testing.assert_array_equal(vector, vector_for(key))
+                found += 1
+        return found
+
+    survivors = check(cache)
+    assert survivors == cache.rows
+    assert cache.get_many(keys[-1:])[0] is not None
+
+    cache.flush()
+    reopened = EmbeddingCache(str(tmp_path), "model", max_rows=100)
+    assert check(reopened) == survivors
+    assert len(list(tmp_path.glob("model/vectors*.f32"))) == 1
+
+
+def test_index_on_disk_matches_vectors_after_eviction_without_flush(tmp_path):
+    keys = [f"k-{i}" for i in range(120)]
+    cache = EmbeddingCache(str(tmp_path), "model", max_rows=100)
+    cache.put_many(keys[:90], [vector_for(key) for key in keys[:90]])
+    cache.flush()
+    # Evicts and compacts; the process then "dies" without another flush.
+    cache.get_many(keys[60:90])
+    cache.put_many(keys[90:], [vector_for(key) for key in keys[90:]])
+
+    reopened = EmbeddingCache(str(tmp_path), "model", max_rows=100)
+    hits = 0
+    for key, vector in zip(keys, reopened.get_many(keys)):
+        if vector is not None:
+            np.testing.assert_array_equal(vector, vector_for(key))
+            hits += 1
+    assert hits > 0
+
+
+def test_two_processes_sharing_a_directory_never_mix_up_vectors(tmp_path):
+    # Two instances stand in for the app and index_cli.py writing the same cache directory.
+    first = EmbeddingCache(str(tmp_path), "model", max_rows=150)
+    second = EmbeddingCache(str(tmp_path), "model", max_rows=150)
+    keys = [f"k-{i}" for i in range(400)]
+    for start in range(0, len(keys), 20):
+        cache = first if (start // 20) % 2 == 0 else second
+        batch = keys[start:start + 20]
+        cache.put_many(batch, [vector_for(key) for key in batch])
+        if start % 60 == 0:
+            cache.flush()
+    first.flush()
+    second.flush()
+
+    for cache in (first, second, EmbeddingCache(str(tmp_path), "model", max_rows=150)):
+        hits = 0
+        for key, vector in zip(keys, cache.get_many(keys)):
+            if vector is not None:
+                np.testing.assert_array_equal(vector, vector_for(key))
+                hits += 1
+        assert hits > 0
@@ -0,0 +1,113 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+import requests
+
+from fetcher import HostScheduler, UrlFetcher, host_of
+from ingest import Source, run_pipeline
+from vector_store import NumpyVectorStore
+
+PAGE = b"<html><body><main><p>" + b"Local test page with enough words to index. " * 20 + b"</p></main></body></html>"
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        Handler.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.startswith("/slow"):
+            time.sleep(float(self.path.rsplit("=", 1)[-1]))
+        if self.path.startswith("/etag") and self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        if self.path.startswith("/etag"):
+            self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+
+
+class FakeEncoder:
+    def encode(self, texts, **kwargs):
+        return np.array([[len(t) % 7 + 1.0, 1.0, 0.5] for t in texts], dtype=np.float32)
+
+
+def test_etag_revalidation_returns_cached_body(server, tmp_path):
+    fetcher = UrlFetcher(cache_dir=str(tmp_path / "http"))
+    url = f"http://127.0.0.1:{server}/etag/page"
+
+    first = fetcher.fetch(url)
+    second = fetcher.fetch(url)
+
+    assert not first.not_modified
+    assert second.not_modified
+    assert second.content == first.content == PAGE
+    assert (url.split(str(server))[1], '"v1"') in Handler.requests_seen
+
+
+def test_not_modified_url_is_not_reparsed(server, tmp_path):
+    fetcher = UrlFetcher(cache_dir=str(tmp_path / "http"))
+    store = NumpyVectorStore(str(tmp_path / "index"))
+    url = f"http://127.0.0.1:{server}/etag/pipeline"
+
+    first = run_pipeline([Source(name=url, kind="url")], FakeEncoder(), store, fetcher=fetcher)
+    second = run_pipeline([Source(name=url, kind="url")], FakeEncoder(), store, fetcher=fetcher)
+
+    assert first.chunks > 0 and not first.errors
+    assert second.unchanged == [url]
+    assert second.chunks == 0 and second.sources == []
+
+
+def test_read_timeout(server):
+    fetcher = UrlFetcher(read_timeout=0.3)
+    began = time.perf_counter()
+    with pytest.raises(requests.exceptions.Timeout):
+        fetcher.fetch(f"http://127.0.0.1:{server}/slow?delay=2")
+    assert time.perf_counter() - began < 1.5
+
+
+def test_scheduler_skips_saturated_host():
+    items = ["http://a/1", "http://a/2", "http://a/3", "http://b/1"]
+    scheduler = HostScheduler(items, per_host=2, host=host_of)
+
+    assert [scheduler.next(), scheduler.next(), scheduler.next()] == ["http://a/1", "http://a/2", "http://b/1"]
+
+    released = threading.Timer(0.2, scheduler.release, args=("http://a/1",))
+    released.start()
+    began = time.perf_counter()
+    assert scheduler.next() == "http://a/3"
+    assert time.perf_counter() - began >= 0.15
+    assert scheduler.next() is None
+
+
+def test_slow_host_does_not_stall_other_hosts(server, tmp_path):
+    # 127.0.0.1 and localhost are different hosts to the scheduler.
+    slow = [Source(name=f"http://127.0.0.1:{server}/slow/{i}?delay=0.5", kind="url") for i in range(8)]
+    fast = Source(name=f"http://localhost:{server}/fast", kind="url")
+    done = {}
+    began = time.perf_counter()
+    run_pipeline(slow + [fast], FakeEncoder(), NumpyVectorStore(str(tmp_path / "index")),
+                 fetcher=UrlFetcher(per_host=2), fetch_workers=4,
+                 on_source_done=lambda name: done.setdefault(name, time.perf_counter() - began))
+
+    assert done[fast.name] < 0.5
+    assert len(done) == 9
@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+from bm25 import BM25Index
+from snapshot import export_snapshot, import_snapshot
+from vector_store import NumpyVectorStore
+
+
+def test_import_restores_bm25_into_an_index_that_is_open(tmp_path):
+    source_store = NumpyVectorStore(str(tmp_path / "source"))
+    vectors = np.random.default_rng(0).normal(size=(20, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"id-{i}" for i in range(20)]
+    documents = [f"chunk {i} about kubernetes" if i < 5 else f"chunk {i} about cooking" for i in range(20)]
+    source_store.upsert(ids, vectors, documents, [{"source": "s"}] * 20)
+    source_store.flush()
+    source_index = BM25Index(str(tmp_path / "source.sqlite3"))
+    source_index.upsert(ids, documents)
+    export_snapshot(source_store, str(tmp_path / "snap"), "model", str(tmp_path / "source.sqlite3"))
+
+    # The live index has uncheckpointed WAL pages and a reader holding it open, as in a running app.
+    live_path = str(tmp_path / "live.sqlite3")
+    live = BM25Index(live_path)
+    live.upsert(["stale"], ["stale chunk about kubernetes"])
+    assert os.path.exists(live_path + "-wal")
+
+    import_snapshot(str(tmp_path / "snap"), NumpyVectorStore(str(tmp_path / "target")), live_path)
+
+    assert live.count() == 20
+    assert {doc_id for doc_id, _ in live.search("kubernetes")} == set(ids[:5])
+    reopened = BM25Index(live_path)
+    assert reopened.count() == 20
+    assert {doc_id for doc_id, _ in reopened.search("kubernetes")} == set(ids[:5])
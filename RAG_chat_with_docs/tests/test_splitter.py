@@ -0,0 +1,19 @@
+from splitter import stream_chunks
+
+PAGE = ("Intro sentence one.   Second sentence follows here!  Third one?\n\n"
+        "   Indented paragraph starts here. It has two sentences.\n"
+        "\tA tab-led line ends the page.")
+
+
+def test_chunk_offsets_point_at_the_chunk_text():
+    chunks = list(stream_chunks("doc", [PAGE, "  Page two text."], max_tokens=8, overlap_tokens=0))
+    assert len(chunks) > 3
+    for chunk in chunks:
+        page = [PAGE, "  Page two text."][chunk.page - 1]
+        first_word = chunk.text.split()[0]
+        assert page[chunk.offset:].startswith(first_word), (chunk.offset, chunk.text)
+
+
+def test_chunk_offsets_with_overlap_point_at_the_carried_sentence():
+    for chunk in stream_chunks("doc", [PAGE], max_tokens=12, overlap_tokens=6):
+        assert PAGE[chunk.offset:].startswith(chunk.text.split()[0])
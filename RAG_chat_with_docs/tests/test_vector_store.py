@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from vector_store import NumpyVectorStore
+
+
+def add_rows(store, start, n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    ids = [f"id-{i}" for i in range(start, start + n)]
+    store.upsert(ids, vectors, [f"doc {i}" for i in range(start, start + n)], [{"source": "s"}] * n)
+    return ids, vectors
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_crash_during_flush_keeps_the_previous_flush(tmp_path, monkeypatch, quantization):
+    store = NumpyVectorStore(str(tmp_path), quantization=quantization)
+    add_rows(store, 0, 50)
+    store.flush()
+    store.delete([f"id-{i}" for i in range(10)])
+    add_rows(store, 50, 30, seed=1)
+
+    def crash(records):
+        raise OSError("disk full")
+
+    # Every array of the new flush is on disk, but records.json is not.
+    monkeypatch.setattr(store, "_write_records", crash)
+    with pytest.raises(OSError):
+        store.flush()
+
+    reopened = NumpyVectorStore(str(tmp_path), quantization=quantization)
+    assert reopened.count() == 50 and len(reopened.vectors) == 50
+    query = np.asarray(reopened.vectors[7])
+    assert reopened.query(query, 1)[0] == "id-7"
+
+
+def test_flush_leaves_one_generation_of_arrays(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), quantization="int8")
+    for batch in range(3):
+        add_rows(store, batch * 20, 20, seed=batch)
+        store.flush()
+    names = sorted(p.name for p in tmp_path.glob("*.npy"))
+    assert names == ["codes_int8.3.npy", "int8_params.3.npy", "vectors.3.npy"]
+    reopened = NumpyVectorStore(str(tmp_path), quantization="int8")
+    assert reopened.count() == 60 and reopened.codes is not None and not reopened._dirty
+
+
+def test_int8_recall_survives_a_distribution_shift(tmp_path):
+    from quantization import recall_at_k
+
+    rng = np.random.default_rng(0)
+    dim = 32
+    store = NumpyVectorStore(str(tmp_path), quantization="int8", rescore_factor=4)
+    # A tiny first batch from one narrow region, then the bulk of the data from somewhere else.
+    first = np.full((5, dim), 0.1, dtype=np.float32) + 0.01 * rng.normal(size=(5, dim)).astype(np.float32)
+    store.upsert([f"a{i}" for i in range(5)], first, ["x"] * 5, [{"source": "a"}] * 5)
+    store.flush()
+    centers = rng.normal(size=(20, dim))
+    for batch in range(6):
+        vectors = centers[rng.integers(20, size=500)] + 0.5 * rng.normal(size=(500, dim))
+        store.upsert([f"b{batch}-{i}" for i in range(500)], vectors, ["x"] * 500, [{"source": "b"}] * 500)
+        store.flush()
+
+    queries = centers[rng.integers(20, size=50)] + 0.5 * rng.normal(size=(50, dim))
+    assert recall_at_k(store, queries, k=10) >= 0.9
+    reopened = NumpyVectorStore(str(tmp_path), quantization="int8", rescore_factor=4)
+    assert recall_at_k(reopened, queries, k=10) >= 0.9
@@ -0,0 +1,154 @@
+"""
+Lightweight stage-level tracing for ingestion and chat turns.
+
+A Trace groups the spans of one chat turn or ingestion job. Each span records
+its stage name, wall time and attributes such as chunk or token counts, and
+finished traces are appended to a JSONL file:
+
+    {"trace": "3f2a...", "kind": "chat", "span": "retrieve.vectors", "start": 1718000000.12,
+     "ms": 4.1, "attrs": {"filtered": false, "hits": 20}}
+
+When tracing is off, callers get NULL_TRACE, whose spans are a shared no-op
+context manager, so instrumented code pays for little more than a method call.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+
+class Span:
+    """A timed stage; attributes can be added while it runs."""
+    __slots__ = ("name", "start", "ms", "attrs")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.start = time.time()
+        self.ms = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _SpanContext:
+    __slots__ = ("trace", "span", "began")
+
+    def __init__(self, trace, span):
+        self.trace = trace
+        self.span = span
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.ms = (time.perf_counter() - self.began) * 1000
+        if exc_type is not None:
+            self.span.attrs["error"] = exc_type.__name__
+        self.trace._add(self.span)
+        return False
+
+
+class Trace:
+    """Collects spans from any thread and writes them out on `finish`."""
+
+    enabled = True
+
+    def __init__(self, tracer, kind, attrs):
+        self.tracer = tracer
+        self.kind = kind
+        self.id = uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.spans = []
+        self._lock = threading.Lock()
+        self._began = time.perf_counter()
+
+    def span(self, name, **attrs):
+        return _SpanContext(self, Span(name, attrs))
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self):
+        """Total milliseconds, span count and summed attributes per stage, in first-seen order."""
+        stages = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in sorted(spans, key=lambda s: s.start):
+            stage = stages.setdefault(span.name, {"stage": span.name, "ms": 0.0, "spans": 0})
+            stage["ms"] += span.ms
+            stage["spans"] += 1
+            for key, value in span.attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stage[key] = stage.get(key, 0) + value
+                else:
+                    stage[key] = value
+        return list(stages.values())
+
+    def finish(self, **attrs):
+        """Records the total duration and appends every span to the trace file."""
+        self.attrs.update(attrs)
+        total_ms = (time.perf_counter() - self._began) * 1000
+        with self._lock:
+            lines = [{"trace": self.id, "kind": self.kind, "span": "total", "start": None, "ms": total_ms,
+                      "attrs": self.attrs}]
+            lines += [{"trace": self.id, "kind": self.kind, "span": s.name, "start": s.start, "ms": s.ms,
+                       "attrs": s.attrs} for s in self.spans]
+        self.tracer._write(lines)
+        return total_ms
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+class _NullTrace:
+    enabled = False
+    spans = ()
+    _span = _NullSpan()
+
+    def span(self, name, **attrs):
+        return self._span
+
+    def breakdown(self):
+        return []
+
+    def finish(self, **attrs):
+        return 0.0
+
+
+NULL_TRACE = _NullTrace()
+
+
+class Tracer:
+    """Hands out traces and appends finished ones to a JSONL file."""
+
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def start(self, kind, enabled=None, **attrs):
+        """A new Trace, or NULL_TRACE when tracing is off."""
+        if not (self.enabled if enabled is None else enabled):
+            return NULL_TRACE
+        return Trace(self, kind, attrs)
+
+    def _write(self, lines):
+        payload = "".join(json.dumps(line, default=str) + "\n" for line in lines)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(payload)
@@ -0,0 +1,611 @@
+"""
+Vector store backends for the RAG app.
+
+Ingestion and chat talk to one small interface, implemented twice:
+
+* ChromaVectorStore wraps the persistent ChromaDB collection.
+* NumpyVectorStore keeps vectors in a contiguous float32 matrix and searches
+  it in-process with a vectorized dot product and `argpartition`. For larger
+  sets it can train an IVF coarse quantizer (k-means) and only scan the
+  closest lists. Everything is persisted as `.npy` files, written under new
+  names on every flush and committed by records.json, and the vectors are
+  memory-mapped on load. Vectors can additionally be stored as int8 or
+  binary codes (see quantization.py): queries then search the codes and
+  rescore a shortlist against the full-precision vectors.
+
+Both expose: count, ids_for_source, sources, upsert, delete, query,
+filter_ids, get_documents, get_records, iter_documents, iter_records and
+flush. `query` and
+`filter_ids` take an optional Chroma-style `where` metadata filter (see
+build_where), which Chroma evaluates natively and the NumPy store turns into
+a row mask before scoring, so filtered queries only scan matching rows.
+
+The NumPy store is held in memory and written back whole on flush, so only
+one process may have it open: it takes a lock file in its directory and a
+second process (e.g. index_cli.py while the app is running) gets
+StoreLockedError instead of silently overwriting the other's rows.
+"""
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from locks import lock_directory
+from quantization import (
+    INT8_MIN_FIT_ROWS, QUANTIZATION_MODES, coarse_scores, encode_binary, encode_int8, fit_int8
+)
+
+
+def build_where(sources=None, since=None, until=None):
+    """Builds a `where` filter on chunk source and ingest time, or None if unfiltered."""
+    clauses = []
+    if sources:
+        clauses.append({"source": {"$in": list(sources)}})
+    if since is not None:
+        clauses.append({"ingested_at": {"$gte": since}})
+    if until is not None:
+        clauses.append({"ingested_at": {"$lt": until}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class ChromaVectorStore:
+    """Adapter over a ChromaDB collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def count(self):
+        return self.collection.count()
+
+    def ids_for_source(self, source):
+        return set(self.collection.get(where={"source": source}, include=[])["ids"])
+
+    def sources(self, batch_size=1000):
+        """Returns {source: {"chunks", "ingested_at"}} over the whole collection."""
+        found = {}
+        for offset in range(0, self.collection.count(), batch_size):
+            page = self.collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            _tally_sources(found, page["metadatas"])
+        return found
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def query(self, query_embedding, n_results, candidate_ids=None, where=None):
+        """Returns the IDs of the nearest chunks, best first."""
+        if candidate_ids is not None:
+            found = self.collection.get(ids=list(candidate_ids), where=where, include=["embeddings"])
+            if not found["ids"]:
+                return []
+            vectors = np.asarray(found["embeddings"], dtype=np.float32)
+            distances = ((vectors - np.asarray(query_embedding, dtype=np.float32)) ** 2).sum(axis=1)
+            return [found["ids"][i] for i in np.argsort(distances)[:n_results]]
+        results = self.collection.query(query_embeddings=[query_embedding], n_results=n_results,
+                                        where=where, include=[])
+        return results.get('ids', [[]])[0]
+
+    def filter_ids(self, ids, where):
+        """Returns the subset of `ids` whose metadata matches `where`."""
+        if where is None or not ids:
+            return set(ids)
+        return set(self.collection.get(ids=list(ids), where=where, include=[])["ids"])
+
+    def get_documents(self, ids):
+        found = self.collection.get(ids=list(ids), include=["documents"])
+        return dict(zip(found["ids"], found["documents"]))
+
+    def get_records(self, ids):
+        """Returns {id: {"document", "metadata", "embedding"}} for the given IDs."""
+        found = self.collection.get(ids=list(ids), include=["documents", "metadatas", "embeddings"])
+        return {
+            doc_id: {"document": document, "metadata": metadata or {}, "embedding": np.asarray(embedding, dtype=np.float32)}
+            for doc_id, document, metadata, embedding in zip(found["ids"], found["documents"], found["metadatas"], found["embeddings"])
+        }
+
+    def iter_documents(self, batch_size=1000):
+        """Yields (ids, documents) pages covering the whole collection."""
+        for offset in range(0, self.collection.count(), batch_size):
+            page = self.collection.get(include=["documents"], limit=batch_size, offset=offset)
+            yield page["ids"], page["documents"]
+
+    def iter_records(self, batch_size=1000):
+        """Yields (ids, embeddings, documents, metadatas) pages covering the whole collection."""
+        for offset in range(0, self.collection.count(), batch_size):
+            page = self.collection.get(include=["embeddings", "documents", "metadatas"],
+                                       limit=batch_size, offset=offset)
+            yield (page["ids"], np.asarray(page["embeddings"], dtype=np.float32), page["documents"],
+                   [meta or {} for meta in page["metadatas"]])
+
+    def flush(self):
+        # ChromaDB persists on every write.
+        pass
+
+
+def _tally_sources(found, metadatas):
+    for meta in metadatas:
+        meta = meta or {}
+        entry = found.setdefault(meta.get("source", ""), {"chunks": 0, "ingested_at": None})
+        entry["chunks"] += 1
+        ingested_at = meta.get("ingested_at")
+        if ingested_at is not None and (entry["ingested_at"] is None or ingested_at > entry["ingested_at"]):
+            entry["ingested_at"] = ingested_at
+
+
+_COMPARISONS = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+
+def _where_mask(where, column, n):
+    """Evaluates a Chroma-style `where` filter to a boolean row mask.
+
+    `column(field, numeric)` returns that metadata field for every row,
+    either as floats (NaN where missing) for comparisons, or as integer codes
+    plus a {value: code} lookup for equality and membership tests.
+    """
+    mask = np.ones(n, dtype=bool)
+    for key, condition in where.items():
+        if key == "$and":
+            for clause in condition:
+                mask &= _where_mask(clause, column, n)
+            continue
+        if key == "$or":
+            any_mask = np.zeros(n, dtype=bool)
+            for clause in condition:
+                any_mask |= _where_mask(clause, column, n)
+            mask &= any_mask
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op in _COMPARISONS:
+                with np.errstate(invalid="ignore"):
+                    mask &= _COMPARISONS[op](column(key, True), value)
+            elif op in ("$eq", "$ne", "$in", "$nin"):
+                codes, lookup = column(key, False)
+                values = [value] if op in ("$eq", "$ne") else value
+                hits = np.isin(codes, [lookup[v] for v in values if v in lookup])
+                mask &= ~hits if op in ("$ne", "$nin") else hits
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+    return mask
+
+
+def _take(column, rows):
+    if isinstance(column, tuple):
+        codes, lookup = column
+        return codes[rows], lookup
+    return column[rows]
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first, without a full sort."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def train_kmeans(vectors, n_clusters, iterations=20, seed=0):
+    """Spherical k-means on normalized vectors; returns the centroid matrix."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = vectors[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                # Re-seed empty clusters so every list stays useful.
+                centroids[c] = vectors[rng.integers(len(vectors))]
+        centroids = _normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+class NumpyVectorStore:
+    """In-process flat or IVF index persisted as `.npy` files.
+
+    Vectors are L2-normalized on insert, so the dot product is cosine
+    similarity. With `ivf_lists` > 0, an IVF quantizer is trained once the
+    store holds `ivf_min_size` vectors and queries only scan the `nprobe`
+    nearest lists. With `quantization` set to "int8" or "binary", the coarse
+    search runs over compact codes held in RAM and the best
+    `n_results * rescore_factor` rows are rescored at full precision. The
+    int8 ranges are refitted on a sample, and every code re-encoded, on flush
+    once the store has doubled since they were last fitted. Opening a store
+    locks its directory to this process (see locks.lock_directory).
+    """
+
+    def __init__(self, path, ivf_lists=0, nprobe=8, ivf_min_size=50_000,
+                 quantization="none", rescore_factor=4):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {quantization}")
+        self.path = path
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self.ivf_min_size = ivf_min_size
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        lock_directory(path)
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _array_file(self, role):
+        """Path of the array `role` ("vectors", "codes_int8", ...) from the last flush, or None."""
+        name = self._files.get(role)
+        return self._file(name) if name and os.path.exists(self._file(name)) else None
+
+    def _load(self):
+        self.ids, self.documents, self.metadatas = [], [], []
+        self.vectors = None
+        self.centroids = None
+        self.assignments = None
+        self._trained_size = 0
+        self._int8_fitted_size = 0
+        self._generation = 0
+        records = {}
+        if os.path.exists(self._file("records.json")):
+            with open(self._file("records.json"), "r", encoding="utf-8") as f:
+                records = json.load(f)
+            self.ids = records["ids"]
+            self.documents = records["documents"]
+            self.metadatas = records["metadatas"]
+            self._trained_size = records.get("trained_size", 0)
+            self._int8_fitted_size = records.get("int8_fitted_size", 0)
+            self._generation = records.get("generation", 0)
+        # role -> file name; stores written before arrays were versioned use fixed names.
+        self._files = records.get("files") or {
+            "vectors": "vectors.npy", "centroids": "centroids.npy", "assignments": "assignments.npy",
+            "int8_params": "int8_params.npy", **{f"codes_{mode}": f"codes_{mode}.npy" for mode in QUANTIZATION_MODES}}
+        if self._array_file("vectors"):
+            self.vectors = np.load(self._array_file("vectors"), mmap_mode="r")
+        if self._array_file("centroids") and self._array_file("assignments"):
+            self.centroids = np.load(self._array_file("centroids"))
+            self.assignments = np.load(self._array_file("assignments"), mmap_mode="r")
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._source_ids = {}
+        for doc_id, meta in zip(self.ids, self.metadatas):
+            self._source_ids.setdefault(meta.get("source"), set()).add(doc_id)
+        self._columns = {}
+        # Growable backing array for self.vectors once it is held in RAM.
+        self._buffer = None
+        self._dirty = False
+        self._load_codes()
+
+    def _load_codes(self):
+        """Loads the quantized codes, rebuilding them if missing or out of date."""
+        self.codes = None
+        self.int8_params = None
+        if self.quantization == "none" or self.vectors is None:
+            return
+        codes_file = self._array_file(f"codes_{self.quantization}")
+        if codes_file:
+            codes = np.load(codes_file)
+            # int8 codes from before ranges were refitted may rest on a tiny first batch: rebuild those.
+            stale = (self.quantization == "int8" and not self._int8_fitted_size
+                     and len(codes) >= INT8_MIN_FIT_ROWS)
+            if len(codes) == len(self.ids) and not stale and (
+                    self.quantization != "int8" or self._array_file("int8_params")):
+                self.codes = codes
+                if self.quantization == "int8":
+                    params = np.load(self._array_file("int8_params"))
+                    self.int8_params = (params[0], params[1])
+                return
+        if self.quantization == "int8":
+            self._fit_int8()
+        self.codes = self._encode(self.vectors)
+        self._dirty = True
+
+    def _fit_int8(self, sample_size=100_000):
+        """Fits the int8 ranges on (a random sample of) every stored vector."""
+        n = len(self.vectors)
+        sample = self.vectors
+        if n > sample_size:
+            sample = self.vectors[np.sort(np.random.default_rng(0).choice(n, sample_size, replace=False))]
+        self.int8_params = fit_int8(np.asarray(sample))
+        self._int8_fitted_size = n if n >= INT8_MIN_FIT_ROWS else 0
+
+    def _encode(self, vectors, block=65536):
+        if self.quantization == "binary":
+            return encode_binary(vectors)
+        if self.int8_params is None:
+            # Too few rows to fit yet: fit_int8 falls back to the fixed unit-vector range.
+            self.int8_params = fit_int8(vectors)
+            self._int8_fitted_size = 0
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), block):
+            codes[start:start + block] = encode_int8(vectors[start:start + block], self.int8_params)
+        return codes
+
+    def _maybe_refit_int8(self):
+        """Refits the int8 ranges and re-encodes all codes once the store has doubled since the last fit."""
+        n = len(self.ids)
+        if self.quantization != "int8" or n < INT8_MIN_FIT_ROWS or n < 2 * self._int8_fitted_size:
+            return
+        self._fit_int8()
+        self.codes = self._encode(self.vectors)
+
+    def _writable(self):
+        # Copy memory-mapped arrays into RAM before the first mutation.
+        if isinstance(self.vectors, np.memmap):
+            self.vectors = self._buffer = np.array(self.vectors)
+        if isinstance(self.assignments, np.memmap):
+            self.assignments = np.array(self.assignments)
+
+    def count(self):
+        return len(self.ids)
+
+    def ids_for_source(self, source):
+        with self._lock:
+            return set(self._source_ids.get(source, ()))
+
+    def sources(self):
+        found = {}
+        with self._lock:
+            _tally_sources(found, self.metadatas)
+        return found
+
+    def _column(self, field, numeric):
+        """A metadata field for every row, cached until the next write."""
+        key = (field, numeric)
+        if key not in self._columns:
+            values = [meta.get(field) for meta in self.metadatas]
+            if numeric:
+                self._columns[key] = np.array(
+                    [v if isinstance(v, (int, float)) else np.nan for v in values], dtype=np.float64)
+            else:
+                lookup = {}
+                codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values),
+                                    dtype=np.int32, count=len(values))
+                self._columns[key] = (codes, lookup)
+        return self._columns[key]
+
+    def _filter_rows(self, where):
+        return np.flatnonzero(_where_mask(where, self._column, len(self.ids)))
+
+    def filter_ids(self, ids, where):
+        if where is None:
+            return set(ids)
+        with self._lock:
+            rows = [self._rows[i] for i in ids if i in self._rows]
+            if not rows:
+                return set()
+            mask = _where_mask(where, lambda field, numeric: _take(self._column(field, numeric), rows), len(rows))
+            return {self.ids[row] for row, keep in zip(rows, mask) if keep}
+
+    def _delete(self, ids):
+        rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+        if not rows:
+            return
+        for row in rows:
+            source = self.metadatas[row].get("source")
+            source_ids = self._source_ids[source]
+            source_ids.discard(self.ids[row])
+            if not source_ids:
+                del self._source_ids[source]
+        self._writable()
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        self.vectors = self._buffer = self.vectors[keep]
+        if self.assignments is not None:
+            self.assignments = self.assignments[keep]
+        if self.codes is not None:
+            self.codes = self.codes[keep]
+        self._dirty = True
+        self.ids = [x for x, k in zip(self.ids, keep) if k]
+        self.documents = [x for x, k in zip(self.documents, keep) if k]
+        self.metadatas = [x for x, k in zip(self.metadatas, keep) if k]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._columns = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self._delete(ids)
+            self._writable()
+            self._append_vectors(vectors)
+            self.ids.extend(ids)
+            self.documents.extend(documents)
+            self.metadatas.extend(metadatas)
+            self._columns = {}
+            start = len(self._rows)
+            for offset, (doc_id, meta) in enumerate(zip(ids, metadatas)):
+                self._rows[doc_id] = start + offset
+                self._source_ids.setdefault(meta.get("source"), set()).add(doc_id)
+            if self.centroids is not None:
+                new_assign = np.argmax(vectors @ self.centroids.T, axis=1)
+                self.assignments = np.concatenate([self.assignments, new_assign])
+            if self.quantization != "none":
+                new_codes = self._encode(vectors)
+                self.codes = new_codes if self.codes is None else np.concatenate([self.codes, new_codes])
+            self._dirty = True
+
+    def _append_vectors(self, vectors):
+        """Appends rows with amortized doubling, so bulk loads are not quadratic."""
+        n = 0 if self.vectors is None else len(self.vectors)
+        needed = n + len(vectors)
+        if self._buffer is None or needed > len(self._buffer):
+            buffer = np.empty((max(needed, 2 * n, 1024), vectors.shape[1]), dtype=np.float32)
+            if n:
+                buffer[:n] = self.vectors
+            self._buffer = buffer
+        self._buffer[n:needed] = vectors
+        self.vectors = self._buffer[:needed]
+
+    def delete(self, ids):
+        with self._lock:
+            self._delete(ids)
+
+    def _maybe_train(self):
+        """(Re)trains the IVF quantizer when enabled and the store has doubled since."""
+        n = len(self.ids)
+        if not self.ivf_lists or n < self.ivf_min_size:
+            return
+        if self.centroids is not None and n < 2 * self._trained_size:
+            return
+        sample = self.vectors
+        if n > 100 * self.ivf_lists:
+            sample = self.vectors[np.random.default_rng(0).choice(n, 100 * self.ivf_lists, replace=False)]
+        self.centroids = train_kmeans(np.asarray(sample), self.ivf_lists)
+        self.assignments = np.argmax(np.asarray(self.vectors) @ self.centroids.T, axis=1)
+        self._trained_size = n
+
+    def query(self, query_embedding, n_results, candidate_ids=None, where=None):
+        """Returns the IDs of the nearest chunks, best first."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            if self.vectors is None or not len(self.ids):
+                return []
+            if candidate_ids is not None:
+                rows = np.array([self._rows[i] for i in candidate_ids if i in self._rows], dtype=np.int64)
+            elif self.centroids is not None and where is None:
+                # Filtered queries skip the IVF probe and scan their matching rows exactly.
+                lists = _top_k(self.centroids @ query, self.nprobe)
+                rows = np.flatnonzero(np.isin(self.assignments, lists))
+            else:
+                rows = None
+            if where is not None:
+                matching = self._filter_rows(where)
+                rows = matching if rows is None else np.intersect1d(rows, matching)
+                if not len(rows):
+                    return []
+            if rows is None:
+                rows = np.arange(len(self.ids))
+                full_scan = True
+            else:
+                full_scan = False
+            if self.codes is not None:
+                # Coarse search over the codes, then rescore the shortlist exactly.
+                codes = self.codes if full_scan else self.codes[rows]
+                scores = coarse_scores(self.quantization, codes, query, self.int8_params)
+                rows = np.sort(rows[_top_k(scores, n_results * self.rescore_factor)])
+                full_scan = False
+            if full_scan:
+                best = _top_k(self.vectors @ query, n_results)
+            else:
+                best = rows[_top_k(self.vectors[rows] @ query, n_results)]
+            return [self.ids[i] for i in best]
+
+    def get_documents(self, ids):
+        with self._lock:
+            return {doc_id: self.documents[self._rows[doc_id]] for doc_id in ids if doc_id in self._rows}
+
+    def get_records(self, ids):
+        """Returns {id: {"document", "metadata", "embedding"}} for the given IDs."""
+        with self._lock:
+            return {
+                doc_id: {"document": self.documents[row], "metadata": self.metadatas[row],
+                         "embedding": np.array(self.vectors[row])}
+                for doc_id, row in ((doc_id, self._rows.get(doc_id)) for doc_id in ids) if row is not None
+            }
+
+    def iter_documents(self, batch_size=1000):
+        for start in range(0, len(self.ids), batch_size):
+            yield self.ids[start:start + batch_size], self.documents[start:start + batch_size]
+
+    def iter_records(self, batch_size=10000):
+        for start in range(0, len(self.ids), batch_size):
+            end = start + batch_size
+            yield self.ids[start:end], np.asarray(self.vectors[start:end]), self.documents[start:end], self.metadatas[start:end]
+
+    def replace_all(self, vectors_file, ids, documents, metadatas):
+        """Swaps the whole index for prebuilt rows, e.g. from a snapshot.
+
+        `vectors_file` is a `.npy` of L2-normalized float32 rows; it is copied
+        into place and memory-mapped, so nothing is re-encoded or re-indexed
+        row by row. Derived files (IVF lists, quantized codes) are rebuilt.
+        """
+        with self._lock:
+            generation = self._generation + 1
+            name = f"vectors.{generation}.npy"
+            shutil.copyfile(vectors_file, self._file(name))
+            # Without IVF lists or codes in `files`, both are rebuilt from the new vectors.
+            self._write_records({"ids": ids, "documents": documents, "metadatas": metadatas, "trained_size": 0,
+                                 "generation": generation, "files": {"vectors": name}})
+            self._load()
+            self._remove_unreferenced()
+        # Persist rebuilt quantized codes (_load marks them dirty) and train IVF lists if enabled.
+        if self.ivf_lists:
+            self._dirty = True
+        self.flush()
+
+    def _write_records(self, records):
+        tmp_path = self._file("records.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        os.replace(tmp_path, self._file("records.json"))
+
+    def _remove_unreferenced(self):
+        """Deletes array files that the current records.json does not name."""
+        referenced = set(self._files.values())
+        for name in os.listdir(self.path):
+            if name.endswith(".npy") and name not in referenced:
+                try:
+                    os.remove(self._file(name))
+                except OSError:
+                    pass  # still memory-mapped on Windows; the next flush retries
+
+    def flush(self):
+        """Persists the index; vectors are memory-mapped again on the next load.
+
+        Every flush writes its arrays under new, generation-numbered names and
+        then swaps in records.json, which names them, in one atomic rename.
+        A crash mid-flush leaves the previous generation intact, so ids and
+        vector rows always match on the next load.
+        """
+        with self._lock:
+            if self.vectors is None or not self._dirty:
+                return
+            self._maybe_train()
+            self._maybe_refit_int8()
+            generation = self._generation + 1
+            arrays = {"vectors": self.vectors}
+            if self.centroids is not None:
+                arrays.update(centroids=self.centroids, assignments=self.assignments)
+            if self.codes is not None:
+                arrays[f"codes_{self.quantization}"] = self.codes
+                if self.int8_params is not None:
+                    arrays["int8_params"] = np.stack(self.int8_params)
+            files = {}
+            for role, array in arrays.items():
+                files[role] = f"{role}.{generation}.npy"
+                np.save(self._file(files[role]), np.asarray(array))
+            self._write_records({"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas,
+                                 "trained_size": self._trained_size, "int8_fitted_size": self._int8_fitted_size,
+                                 "generation": generation, "files": files})
+            self._generation, self._files = generation, files
+            # Hand the full-precision vectors back to the page cache.
+            self.vectors = np.load(self._file(files["vectors"]), mmap_mode="r")
+            self._buffer = None
+            self._dirty = False
+            self._remove_unreferenced()
+
+
+def open_vector_store(backend, collection_factory=None, path=None, **options):
+    """Creates the configured backend: "chroma" or "numpy".
+
+    `options` (ivf_lists, nprobe, ...) only apply to the NumPy backend.
+    """
+    if backend == "chroma":
+        return ChromaVectorStore(collection_factory())
+    if backend == "numpy":
+        return NumpyVectorStore(path, **options)
+    raise ValueError(f"Unknown vector backend: {backend}")